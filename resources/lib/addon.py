@@ -10,6 +10,11 @@
 
 import sys
 
-from src import addon  # pylint: disable=import-error
+from src.lib import import_profile  # pylint: disable=import-error
+
+# started before the addon is imported, so the report covers all of its modules
+import_profile.start()
+
+from src import addon  # pylint: disable=import-error,wrong-import-position
 
 addon.invoke(sys.argv)
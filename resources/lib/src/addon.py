@@ -10,12 +10,13 @@
 
 import sys
 
-from .api import API
 from .constants import MODES
-from .lib.context import Context
+from .lib import import_profile
 from .lib.logger import Log
+from .lib.memoizer import cache_info
 from .lib.privacy_policy import show_privacy_policy
 from .lib.routing import Router
+from .lib.session import get_session
 from .lib.url_utils import parse_query
 
 # pylint: disable=import-outside-toplevel
@@ -50,10 +51,10 @@ def _manage_users():
     manage_users.invoke(CONTEXT)
 
 
-@router.route(MODES.MOST_POPULAR, kwargs=['page_token', 'region_code'])
-def _most_popular(page_token='', region_code=''):
+@router.route(MODES.MOST_POPULAR, kwargs=['page_token', 'region_code', 'page'])
+def _most_popular(page_token='', region_code='', page=1):
     from .routes import most_popular
-    most_popular.invoke(CONTEXT, page_token=page_token, region_code=region_code)
+    most_popular.invoke(CONTEXT, page_token=page_token, region_code=region_code, page=page)
 
 
 @router.route(MODES.MOST_POPULAR_REGIONALLY)
@@ -117,10 +118,10 @@ def _playlists(channel_id, page_token=''):
     playlists.invoke(CONTEXT, channel_id, page_token=page_token)
 
 
-@router.route(MODES.PLAYLIST, args=['playlist_id'], kwargs=['page_token', 'mine'])
-def _playlist(playlist_id, page_token='', mine=False):
+@router.route(MODES.PLAYLIST, args=['playlist_id'], kwargs=['page_token', 'mine', 'page'])
+def _playlist(playlist_id, page_token='', mine=False, page=1):
     from .routes import playlist
-    playlist.invoke(CONTEXT, playlist_id, page_token, mine)
+    playlist.invoke(CONTEXT, playlist_id, page_token, mine, page)
 
 
 @router.route(MODES.PLAY, kwargs=['video_id', 'playlist_id', 'prompt_subtitles', 'start_offset'])
@@ -148,16 +149,17 @@ def _search():
 
 
 @router.route(MODES.SEARCH_QUERY, kwargs=['page_token', 'query', 'search_type',
-                                          'order', 'channel_id'])
-def _search_query(query='', page_token='', search_type='video', order='relevance', channel_id=None):
+                                          'order', 'channel_id', 'page'])
+def _search_query(query='', page_token='', search_type='video', order='relevance',
+                  channel_id=None, page=1):
     from .routes import search_query
-    search_query.invoke(CONTEXT, query, page_token, search_type, order, channel_id)
+    search_query.invoke(CONTEXT, query, page_token, search_type, order, channel_id, page)
 
 
-@router.route(MODES.MY_CHANNEL, kwargs=['page_token'])
-def _my_channel(page_token=''):
+@router.route(MODES.MY_CHANNEL, kwargs=['page_token', 'page'])
+def _my_channel(page_token='', page=1):
     from .routes import my_channel
-    my_channel.invoke(CONTEXT, page_token)
+    my_channel.invoke(CONTEXT, page_token, page)
 
 
 @router.route(MODES.CATEGORIES, kwargs=['page_token'])
@@ -205,7 +207,8 @@ def _settings():
 def invoke(argv):
     global CONTEXT  # pylint: disable=global-statement
 
-    CONTEXT = Context()
+    # kept warm across invocations while the interpreter is reused
+    CONTEXT = get_session().context()
 
     CONTEXT.argv = argv
     CONTEXT.handle = argv[1]
@@ -223,9 +226,9 @@ def invoke(argv):
     if not privacy_policy_accepted:
         sys.exit(1)
 
-    CONTEXT.api = API(
-        language=CONTEXT.settings.language,
-        region=CONTEXT.settings.region
-    )
-
     router.invoke(CONTEXT.query)
+    CONTEXT.executor.shutdown()
+
+    LOG.debug('Function cache (memory): %s' % cache_info())
+
+    import_profile.finish('plugin', CONTEXT.mode)
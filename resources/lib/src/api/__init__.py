@@ -10,4 +10,5 @@
 
 from .api import API
 
-__all__ = ['api', 'API', 'decorators', 'utils']
+__all__ = ['api', 'API', 'auth', 'conditional', 'decorators', 'quota', 'tokens', 'uploads',
+           'utils']
@@ -8,6 +8,7 @@
     See LICENSES/GPL-2.0-only.txt for more information.
 """
 
+import threading
 import time
 
 import tubed_api  # pylint: disable=import-error
@@ -21,12 +22,51 @@ from ..constants import CREDENTIALS
 from ..constants import ONE_MINUTE
 from ..constants import ONE_WEEK
 from ..lib import memoizer
+from ..lib.executor import Executor
+from ..lib.logger import Log
 from ..storage.users import UserStorage
+from .auth import AuthSnapshot
+from .conditional import ConditionalRequests
+from .conditional import supports_conditional
 from .decorators import api_request
+from .quota import Quota
+from .uploads import UPLOADS_FIELDS
+from .uploads import uploads_playlist
+
+LOG = Log('api', __file__)
+
+
+# settings read by the memoizer on the first call rather than on import, by setting id
+SETTINGS = {}
+
+
+def _setting_int(setting_id):
+    if setting_id not in SETTINGS:
+        SETTINGS[setting_id] = xbmcaddon.Addon(ADDON_ID).getSettingInt(setting_id)
+    return SETTINGS[setting_id]
 
 
 def memoizer_ttl():
-    return xbmcaddon.Addon(ADDON_ID).getSettingInt('cache.ttl.function')
+    return ONE_MINUTE * _setting_int('cache.ttl.function')
+
+
+def memoizer_grace():
+    return ONE_MINUTE * _setting_int('cache.grace.function')
+
+
+def quota_budget():
+    return xbmcaddon.Addon(ADDON_ID).getSettingInt('api.quota.budget')
+
+
+def quota_reserve():
+    return xbmcaddon.Addon(ADDON_ID).getSettingInt('api.quota.reserve')
+
+
+def set_credentials():
+    tubed_api.CLIENT_ID = str(CREDENTIALS.ID)
+    tubed_api.CLIENT_SECRET = str(CREDENTIALS.SECRET)
+    tubed_api.API_KEY = str(CREDENTIALS.KEY)
+    tubed_api.HTTP_REFERRER = 'https://tubedaddon.panicked.xyz/'
 
 
 class API:
@@ -37,27 +77,53 @@ class API:
         self._max_results = 50
 
         self.users = UserStorage()
-        self._api = tubed_api
+        self._auth = None
+        self._auth_lock = threading.Lock()
 
-        self._api.CLIENT_ID = str(CREDENTIALS.ID)
-        self._api.CLIENT_SECRET = str(CREDENTIALS.SECRET)
-        self._api.API_KEY = str(CREDENTIALS.KEY)
-        self._api.HTTP_REFERRER = 'https://tubedaddon.panicked.xyz/'
+        self._api = tubed_api
 
+        set_credentials()
         self._api.ACCESS_TOKEN = self.users.access_token
 
         self._usher = usher
 
         self.quality = self._usher.Quality
 
-        self.api = v3
+        self.api = ConditionalRequests(v3)
         self.client = oauth.Client()
         self.refresh_token()
 
+        self.quota = Quota(self.users, budget=quota_budget(), reserve=quota_reserve())
+        memoizer.LIMIT_FACTOR = self.quota.ttl_factor
+        # the list functions of v3 share their signature, one stands for all of them
+        memoizer.CONDITIONAL_REQUESTS = supports_conditional(v3.videos.get)
+
+    @property
+    def auth(self):
+        """
+        :return: authentication state of the current user, see `AuthSnapshot`
+        :rtype: AuthSnapshot
+        """
+        if self._auth is None:
+            self._auth = AuthSnapshot(self.users)
+
+        return self._auth
+
     @property
     def logged_in(self):
         self.refresh_token()
-        return self.users.access_token and not self.users.token_expired
+        return self.auth.logged_in
+
+    @property
+    def has_channel(self):
+        if not self.logged_in:
+            return False
+
+        auth = self.auth
+        if auth.has_channel is None:
+            auth.has_channel = self.channel_by_username('mine') != {}
+
+        return auth.has_channel
 
     @property
     def language(self):
@@ -104,6 +170,7 @@ class API:
         })
 
     @api_request
+    @memoizer.invalidates('playlists:mine', 'playlist:{playlist_id}')
     def remove_playlist(self, playlist_id):
         parameters = {
             'id': playlist_id,
@@ -113,6 +180,7 @@ class API:
         return self.api.playlists.delete(parameters=parameters)
 
     @api_request
+    @memoizer.invalidates('playlists:mine', 'playlist:{playlist_id}')
     def rename_playlist(self, playlist_id, title, privacy_status='private', fields=None):
         parameters = {
             'part': 'snippet,id,status'
@@ -134,6 +202,7 @@ class API:
         return self.api.playlists.update(parameters=parameters, data=data)
 
     @api_request
+    @memoizer.invalidates('playlists:mine')
     def create_playlist(self, title, privacy_status='private', fields=None):
         parameters = {
             'part': 'snippet,status'
@@ -154,6 +223,7 @@ class API:
         return self.api.playlists.insert(parameters=parameters, data=data)
 
     @api_request
+    @memoizer.invalidates('playlist:{playlist_id}')
     def add_to_playlist(self, playlist_id, video_id, fields=None):
         parameters = {
             'part': 'snippet',
@@ -176,14 +246,15 @@ class API:
         return self.api.playlist_items.insert(parameters=parameters, data=data)
 
     @api_request
-    def remove_from_playlist(self, playlist_item_id):
-
+    @memoizer.invalidates('playlist:{playlist_id}')
+    def remove_from_playlist(self, playlist_item_id, playlist_id):  # pylint: disable=unused-argument
+        # playlist_id is only read by the invalidation tag above, the item id is unique
         return self.api.playlist_items.delete({
             'id': playlist_item_id
         })
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl, tags=['rating:{video_id}'])
     def rating(self, video_id):
         if isinstance(video_id, list):
             video_id = ','.join(video_id)
@@ -193,6 +264,7 @@ class API:
         })
 
     @api_request
+    @memoizer.invalidates('rating:{video_id}', 'rating:mine')
     def rate(self, video_id, rating='like'):
         parameters = {
             'id': video_id,
@@ -202,6 +274,7 @@ class API:
         return self.api.videos.rate(parameters=parameters)
 
     @api_request
+    @memoizer.invalidates('subscriptions:mine')
     def subscribe(self, channel_id):
         parameters = {
             'part': 'snippet'
@@ -218,6 +291,7 @@ class API:
         return self.api.subscriptions.insert(parameters=parameters, data=data)
 
     @api_request
+    @memoizer.invalidates('subscriptions:mine')
     def unsubscribe(self, subscription_id):
 
         return self.api.subscriptions.delete({
@@ -225,7 +299,9 @@ class API:
         })
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl,
+                           tags=['subscriptions:{channel_id}'],
+                           grace=memoizer_grace, mask='fields')
     def subscriptions(self, channel_id, order='alphabetical', page_token='', fields=None):
         parameters = {
             'part': 'snippet',
@@ -247,7 +323,7 @@ class API:
         return self.api.subscriptions.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl, grace=memoizer_grace, mask='fields')
     def video_category(self, category_id, page_token='', fields=None):
         parameters = {
             'part': 'snippet,contentDetails,status',
@@ -267,7 +343,7 @@ class API:
         return self.api.videos.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl)
     def video_categories(self, page_token=''):
         parameters = {
             'part': 'snippet',
@@ -281,7 +357,7 @@ class API:
         return self.api.video_categories.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl)
     def channel_sections(self, channel_id):
         parameters = {
             'part': 'snippet,contentDetails',
@@ -297,7 +373,8 @@ class API:
         return self.api.channel_sections.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl, tags=['playlists:{channel_id}'],
+                           grace=memoizer_grace, mask='fields')
     def playlists_of_channel(self, channel_id, page_token='', fields=None):
         parameters = {
             'part': 'snippet',
@@ -318,7 +395,8 @@ class API:
         return self.api.playlists.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl, tags=['playlist:{playlist_id}'],
+                           grace=memoizer_grace, mask='fields')
     def playlist_items(self, playlist_id, page_token='', max_results=None, fields=None):
         parameters = {
             'part': 'snippet',
@@ -335,7 +413,7 @@ class API:
         return self.api.playlist_items.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl)
     def channel_by_username(self, username):
         parameters = {
             'part': 'id',
@@ -350,7 +428,7 @@ class API:
         return self.api.channels.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl, mask='fields')
     def channels(self, channel_id, fields=None):
         if isinstance(channel_id, list):
             channel_id = ','.join(channel_id)
@@ -370,7 +448,8 @@ class API:
         return self.api.channels.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl, tags=['rating:mine'],
+                           grace=memoizer_grace, mask='fields')
     def my_rating(self, rating='like', page_token='', fields=None):
         parameters = {
             'part': 'snippet,status',
@@ -387,7 +466,7 @@ class API:
         return self.api.videos.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl, mask='fields')
     def videos(self, video_id, live_details=False, fields=None):
         if isinstance(video_id, list):
             video_id = ','.join(video_id)
@@ -407,7 +486,8 @@ class API:
         return self.api.videos.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl, tags=['playlist:{playlist_id}'],
+                           mask='fields')
     def playlists(self, playlist_id, fields=None):
         if isinstance(playlist_id, list):
             playlist_id = ','.join(playlist_id)
@@ -423,7 +503,7 @@ class API:
         return self.api.playlists.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl)
     def comment_thread(self, thread_id):
         parameters = {
             'part': 'snippet',
@@ -434,7 +514,7 @@ class API:
         return self.api.comment_threads.get(parameters=parameters, unauthorized=True)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl)
     def comment(self, comment_id):
         parameters = {
             'part': 'snippet',
@@ -445,7 +525,7 @@ class API:
         return self.api.comments.get(parameters=parameters, unauthorized=True)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl)
     def comment_threads(self, video_id, order='relevance', page_token='', max_results=None):
         parameters = {
             'part': 'snippet',
@@ -461,7 +541,7 @@ class API:
         return self.api.comment_threads.get(parameters=parameters, unauthorized=True)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl)
     def comments(self, parent_id, page_token='', max_results=None):
         parameters = {
             'part': 'snippet',
@@ -475,33 +555,28 @@ class API:
 
         return self.api.comments.get(parameters=parameters, unauthorized=True)
 
-    @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
     def channel_videos(self, channel_id, page_token='', fields=None):
-        parameters = {
-            'part': 'snippet',
-            'hl': self.language,
-            'maxResults': str(self.max_results),
-            'type': 'video',
-            'safeSearch': 'none',
-            'order': 'date'
-        }
-
-        if channel_id == 'mine':
-            parameters['forMine'] = 'true'
-        else:
-            parameters['channelId'] = channel_id
-
-        if fields:
-            parameters['fields'] = fields + ',nextPageToken'
-
-        if page_token:
-            parameters['pageToken'] = page_token
+        """
+        Videos of a channel, newest first, from its uploads playlist
+
+        :param channel_id: channel id or 'mine'
+        :type channel_id: str
+        :param page_token: page token
+        :type page_token: str
+        :param fields: fields of the playlist items, defaults to UPLOADS_FIELDS
+        :type fields: str
+        :return: playlistItems.list payload, {} if the uploads playlist couldn't be found
+        :rtype: dict
+        """
+        playlist_id = uploads_playlist(self, channel_id)
+        if not playlist_id:
+            return {}
 
-        return self.api.search.get(parameters=parameters)
+        return self.playlist_items(playlist_id, page_token=page_token,
+                                   fields=fields or UPLOADS_FIELDS)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl, mask='fields')
     def live_events(self, event_type='live', order='relevance',
                     page_token='', fields=None, published_after=None):
 
@@ -528,7 +603,7 @@ class API:
         return self.api.search.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl, mask='fields')
     def related_videos(self, video_id, page_token='', max_results=None, fields=None):
         parameters = {
             'relatedToVideoId': video_id,
@@ -548,7 +623,7 @@ class API:
         return self.api.search.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl, mask='fields')
     def search(self, query, search_type=None, event_type='', channel_id='',  # pylint: disable=too-many-arguments
                order='relevance', safe_search='moderate', page_token='', fields=None):
 
@@ -603,7 +678,7 @@ class API:
         return self.api.search.get(parameters=parameters)
 
     @api_request
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl, grace=memoizer_grace, mask='fields')
     def most_popular(self, page_token='', region_code='', fields=None):
         parameters = {
             'part': 'snippet,status',
@@ -621,7 +696,7 @@ class API:
 
         return self.api.videos.get(parameters=parameters)
 
-    @memoizer.cache_method(limit=ONE_MINUTE * memoizer_ttl())
+    @memoizer.cache_method(limit=memoizer_ttl, tags=['playlist:{playlist_id}'])
     def video_id_to_playlist_item_id(self, playlist_id, video_id, page_token=''):
         payload = self.playlist_items(
             playlist_id=playlist_id,
@@ -653,14 +728,25 @@ class API:
         return self._usher.resolve(video_id, quality=quality,
                                    language=self.language, region=self.region)
 
-    @api_request
     def refresh_token(self):
-        if self.users.access_token and self.users.token_expired:
-            access_token, expiry = self.client.refresh_token(self.users.refresh_token)
-            self.users.access_token = access_token
-            self.users.token_expiry = time.time() + int(expiry)
-            self.users.save()
-            self.refresh_client()
+        # checked before every request, the snapshot avoids reading the user storage each time
+        if not self.auth.needs_refresh():
+            return
+
+        with self._auth_lock:
+            if self.auth.needs_refresh():
+                # the service refreshes tokens ahead of their expiry, use its token if it did
+                self.refresh_client(reset_cache=False)
+
+            if self.auth.needs_refresh():
+                LOG.debug('Access token was not refreshed by the service, refreshing it now')
+                self._refresh_token()
+
+    @api_request
+    def _refresh_token(self):
+        access_token, expiry = self.client.refresh_token(self.auth.refresh_token)
+        self.users.update_tokens(self.users.uuid, access_token, time.time() + int(expiry))
+        self.refresh_client(reset_cache=False)
 
     @api_request
     def revoke_token(self):
@@ -700,11 +786,15 @@ class API:
 
         return data
 
-    def refresh_client(self):
+    def refresh_client(self, reset_cache=True):
         self.users.load()
         self._api.ACCESS_TOKEN = self.users.access_token
         self.client = oauth.Client()
-        memoizer.reset_cache()
+        self._auth = None
+
+        # a refreshed token belongs to the same user, cached results remain valid
+        if reset_cache:
+            memoizer.reset_cache()
 
     def calculate_next_page_token(self, page):
         """
@@ -732,3 +822,78 @@ class API:
         high_iteration = (position // len(low)) % len(high)
 
         return 'C%sAA' % ''.join([high[high_iteration], low[low_iteration], overflow_token])
+
+    def fetch_all_pages(self, method, *args, executor=None, first_page=None, **kwargs):
+        """
+        Fetch every page of a paginated request
+
+        Page tokens are calculated from the first page's pageInfo.totalResults and the
+        remaining pages are requested concurrently. If a calculated token doesn't match the
+        tokens returned by the api, or a page fails, the rest is walked with nextPageToken.
+
+        :param method: paginated API method accepting `page_token` ie. self.playlist_items
+        :param executor: executor for the concurrent requests, a temporary one when None
+        :type executor: lib.executor.Executor | None
+        :param first_page: response of the first page when it was already requested, with
+                           pageInfo/totalResults in its fields
+        :type first_page: dict | None
+        :return: items of all pages
+        :rtype: list
+        """
+        if kwargs.get('fields'):
+            kwargs['fields'] += ',pageInfo/totalResults'
+
+        payload = first_page
+        if payload is None:
+            payload = method(*args, page_token='', **kwargs)
+
+        items = list(payload.get('items', []))
+        page_token = payload.get('nextPageToken')
+        if not page_token or 'error' in payload:
+            return items
+
+        total_results = int(payload.get('pageInfo', {}).get('totalResults', 0) or 0)
+        page_count = -(-total_results // self.max_results)
+
+        page_tokens = []
+        try:
+            page_tokens = [self.calculate_next_page_token(page)
+                           for page in range(2, page_count + 1)]
+        except IndexError:
+            pass
+
+        if page_tokens and page_tokens[0] == page_token:
+            local_executor = executor is None
+            if local_executor:
+                executor = Executor()
+
+            try:
+                pages = executor.gather(*[
+                    executor.submit('page %d' % (index + 2), method, *args,
+                                    page_token=token, **kwargs)
+                    for index, token in enumerate(page_tokens)
+                ])
+            finally:
+                if local_executor:
+                    executor.shutdown()
+
+            # keep the pages up to the first one that disagrees with the calculated tokens
+            next_tokens = page_tokens[1:] + [None]
+            for page, next_token in zip(pages, next_tokens):
+                if 'error' in page:
+                    break
+
+                items += page.get('items', [])
+                page_token = page.get('nextPageToken')
+                if page_token != next_token:
+                    break
+
+        while page_token:
+            payload = method(*args, page_token=page_token, **kwargs)
+            if 'error' in payload:
+                break
+
+            items += payload.get('items', [])
+            page_token = payload.get('nextPageToken')
+
+        return items
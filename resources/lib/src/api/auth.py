@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+import time
+
+from ..constants import ONE_MINUTE
+
+# access tokens expiring within this many seconds are refreshed ahead of time
+REFRESH_MARGIN = ONE_MINUTE
+
+
+class AuthSnapshot:
+    """
+    Authentication state of the current user, read from the user storage once and kept
+    until the token is refreshed or the client changes
+    """
+
+    def __init__(self, users):
+        self.access_token = users.access_token
+        self.refresh_token = users.refresh_token
+        self.token_expiry = users.token_expiry
+
+        # whether the user has a channel, looked up on first use
+        self.has_channel = None
+
+    @property
+    def expired(self):
+        if not self.access_token:
+            return True
+
+        # in this case no expiration date was set
+        if self.token_expiry == -1:
+            return False
+
+        return self.token_expiry <= int(time.time())
+
+    @property
+    def logged_in(self):
+        return not self.expired
+
+    def needs_refresh(self, margin=REFRESH_MARGIN):
+        """
+        :param margin: seconds before the expiry the token is refreshed
+        :type margin: int
+        :return: whether there is an access token expiring within the margin
+        :rtype: bool
+        """
+        if not self.access_token or self.token_expiry == -1:
+            return False
+
+        return self.token_expiry <= time.time() + margin
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+import functools
+import inspect
+
+from ..lib import memoizer
+from ..lib.logger import Log
+from . import quota
+
+LOG = Log('api', __file__)
+
+# functions of the wrapped module by whether they accept request headers. only functions
+# with an explicit headers parameter do, conditional requests are off for every other one
+SUPPORTS_HEADERS = {}
+
+
+class ConditionalRequests:
+    """
+    Proxy of the tubed_api v3 module making conditional list requests
+
+    List requests made while the memoizer fetches a result ask for the etag of the response,
+    and are sent with If-None-Match when the memoizer holds an expired result with an etag.
+    A 304 is reported back to the memoizer, which extends the expired result. Only list
+    functions accepting a `headers` argument and reporting the status of a 304 as an error
+    payload make conditional requests.
+
+    Every request is charged to the quota of the api method making it, see `quota.charge`.
+    """
+
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, name):
+        return _Resource(name, getattr(self._module, name))
+
+
+class _Resource:
+
+    def __init__(self, name, resource):
+        self._name = name
+        self._resource = resource
+
+    def __getattr__(self, name):
+        attribute = getattr(self._resource, name)
+
+        if not callable(attribute):
+            return attribute
+
+        endpoint = '%s.%s' % (self._name, name)
+
+        if name != 'get' or not supports_conditional(attribute):
+            return functools.partial(_request, endpoint, attribute)
+
+        return functools.partial(_get, endpoint, attribute)
+
+
+def supports_conditional(func):
+    """
+    Whether a function of the wrapped module can make conditional requests
+
+    :param func: function of the wrapped module, ie. v3.videos.get
+    :return: whether it accepts request headers
+    :rtype: bool
+    """
+    if func not in SUPPORTS_HEADERS:
+        try:
+            parameters = inspect.signature(func).parameters
+            SUPPORTS_HEADERS[func] = 'headers' in parameters
+        except (TypeError, ValueError):
+            SUPPORTS_HEADERS[func] = False
+
+    return SUPPORTS_HEADERS[func]
+
+
+def _request(endpoint, func, *args, **kwargs):
+    quota.charge(endpoint)
+    return func(*args, **kwargs)
+
+
+def _get(endpoint, func, parameters, **kwargs):
+    quota.charge(endpoint)
+
+    state = memoizer.revalidation()
+    if state is None:
+        return func(parameters=parameters, **kwargs)
+
+    parameters = dict(parameters)
+    if parameters.get('fields') and 'etag' not in _top_level_fields(parameters['fields']):
+        parameters['fields'] += ',etag'
+
+    if not state.etag:
+        return func(parameters=parameters, **kwargs)
+
+    headers = dict(kwargs.pop('headers', None) or {})
+    headers['If-None-Match'] = state.etag
+
+    state.sent = True
+    payload = func(parameters=parameters, headers=headers, **kwargs)
+
+    state.not_modified = _not_modified(payload)
+    if state.not_modified:
+        LOG.debug('Conditional request: %s not modified' % endpoint)
+
+    return payload
+
+
+def _not_modified(payload):
+    # an empty payload may be a failed request as well, only an explicit status counts
+    if isinstance(payload, dict) and isinstance(payload.get('error'), dict):
+        return str(payload['error'].get('code')) == '304'
+
+    return False
+
+
+def _top_level_fields(fields):
+    payload = []
+
+    depth = 0
+    field = ''
+
+    for character in fields:
+        if character == '(':
+            depth += 1
+        elif character == ')':
+            depth -= 1
+
+        if character == ',' and depth == 0:
+            payload.append(field.strip())
+            field = ''
+            continue
+
+        if depth == 0 and character != ')':
+            field += character
+
+    payload.append(field.strip())
+    return payload
@@ -44,7 +44,10 @@ def api_request(func):
             except:  # pylint: disable=bare-except
                 LOG.debug('API Request [%s]: Failed to log request')
 
-        payload = func(*args, **kwargs)
+        try:
+            payload = func(*args, **kwargs)
+        finally:
+            __record_quota(args)
 
         if context.settings.log_api_requests:
             try:
@@ -59,6 +62,16 @@ def api_request(func):
     return wrapper
 
 
+def __record_quota(args):
+    # only requests that reached the api were charged, memoized results cost nothing
+    if len(args) == 0:
+        return
+
+    api_quota = getattr(args[0], 'quota', None)
+    if api_quota is not None:
+        api_quota.record_pending()
+
+
 def __api_error_check(payload):
     context = Context()
 
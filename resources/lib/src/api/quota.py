@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+import os
+import threading
+import time
+
+from ..constants import ADDONDATA_PATH
+from ..constants import ONE_DAY
+from ..constants import ONE_HOUR
+from ..lib.database import Database
+from ..lib.logger import Log
+
+LOG = Log('api', __file__)
+
+# quota units charged per request, by v3 resource and method
+# https://developers.google.com/youtube/v3/determine_quota_cost
+COSTS = {
+    'channel_sections.get': 1,
+    'channels.get': 1,
+    'comment_threads.get': 1,
+    'comments.get': 1,
+    'i18n_languages.get': 1,
+    'i18n_regions.get': 1,
+    'playlist_items.delete': 50,
+    'playlist_items.get': 1,
+    'playlist_items.insert': 50,
+    'playlists.delete': 50,
+    'playlists.get': 1,
+    'playlists.insert': 50,
+    'playlists.update': 50,
+    'search.get': 100,
+    'subscriptions.delete': 50,
+    'subscriptions.get': 1,
+    'subscriptions.insert': 50,
+    'video_categories.get': 1,
+    'videos.get': 1,
+    'videos.get_rating': 1,
+    'videos.rate': 50,
+}
+
+# cost of requests missing from COSTS, list requests cost 1 and writes 50
+READ_COST = 1
+WRITE_COST = 50
+
+# the daily quota resets at midnight pacific time, daylight saving time is ignored
+RESET_UTC_OFFSET = -8 * ONE_HOUR
+
+# usage is kept for this many days
+HISTORY_DAYS = 31
+
+# memoized results stay valid this many times longer while the remaining quota is low
+LOW_QUOTA_TTL_FACTOR = 4
+
+# seconds the units used are kept before they're read again, other processes use the
+# quota of the same user
+USED_TTL = 30
+
+# requests made by the api method running on each thread, see `charge` and `flush`
+PENDING = threading.local()
+
+
+def cost(endpoint):
+    """
+    :param endpoint: v3 resource and method ie. 'search.get'
+    :type endpoint: str
+    :return: quota units charged for a request
+    :rtype: int
+    """
+    if endpoint in COSTS:
+        return COSTS[endpoint]
+
+    return READ_COST if endpoint.endswith('.get') else WRITE_COST
+
+
+def charge(endpoint):
+    """
+    Charge a request made on this thread, recorded when the api method that made it returns
+
+    :param endpoint: v3 resource and method ie. 'search.get'
+    :type endpoint: str
+    """
+    charges = getattr(PENDING, 'charges', None)
+    if charges is None:
+        charges = PENDING.charges = {}
+
+    requests, units = charges.get(endpoint, (0, 0))
+    charges[endpoint] = (requests + 1, units + cost(endpoint))
+
+
+def flush():
+    """
+    :return: requests charged on this thread since the last flush, by endpoint
+             as (requests, units)
+    :rtype: dict
+    """
+    charges = getattr(PENDING, 'charges', None) or {}
+    PENDING.charges = {}
+    return charges
+
+
+def today():
+    return time.strftime('%Y-%m-%d', time.gmtime(time.time() + RESET_UTC_OFFSET))
+
+
+class QuotaLedger(Database):
+    """
+    Quota units used per day, user and endpoint
+    """
+
+    def __init__(self):
+        filename = os.path.join(ADDONDATA_PATH, 'data', 'quota.sqlite')
+
+        super().__init__(filename)
+
+    def record(self, day, user, charges):
+        """
+        :param day: day the quota was used on, see `today`
+        :type day: str
+        :param user: uuid of the user
+        :type user: str
+        :param charges: requests and units by endpoint, see `flush`
+        :type charges: dict
+        """
+        oldest = time.strftime(
+            '%Y-%m-%d', time.gmtime(time.time() + RESET_UTC_OFFSET - HISTORY_DAYS * ONE_DAY)
+        )
+
+        with self._transaction():
+            self._execute_many(
+                'INSERT OR IGNORE INTO %s (day,user,endpoint,requests,units) '
+                'VALUES(?,?,?,0,0)' % self.table_name,
+                [(day, user, endpoint) for endpoint in charges]
+            )
+            self._execute_many(
+                'UPDATE %s SET requests=requests+?, units=units+? '
+                'WHERE day=? AND user=? AND endpoint=?' % self.table_name,
+                [(requests, units, day, user, endpoint)
+                 for endpoint, (requests, units) in charges.items()]
+            )
+            self._execute(True, 'DELETE FROM %s WHERE day<?' % self.table_name, [oldest])
+
+    def used(self, day, user):
+        """
+        :return: quota units used by the user on the day
+        :rtype: int
+        """
+        self._open()
+
+        result = self._execute(
+            False,
+            'SELECT SUM(units) FROM %s WHERE day=? AND user=?' % self.table_name,
+            [day, user]
+        )
+        item = result.fetchone() if result is not None else None
+
+        self._close()
+
+        return int(item[0] or 0) if item else 0
+
+    def usage(self, day, user):
+        """
+        :return: requests and units used by the user on the day, by endpoint
+        :rtype: dict
+        """
+        self._open()
+
+        result = self._execute(
+            False,
+            'SELECT endpoint, requests, units FROM %s WHERE day=? AND user=? '
+            'ORDER BY units DESC' % self.table_name,
+            [day, user]
+        )
+        items = result.fetchall() if result is not None else []
+
+        self._close()
+
+        return dict((endpoint, (requests, units)) for endpoint, requests, units in items)
+
+    def _create_table(self):
+        if not self.table_created:
+            self._execute(
+                True,
+                'CREATE TABLE IF NOT EXISTS %s (day TEXT, user TEXT, endpoint TEXT, '
+                'requests INTEGER, units INTEGER, PRIMARY KEY (day, user, endpoint))' %
+                self.table_name
+            )
+            self.table_created = True
+
+
+class Quota:
+    """
+    Daily quota budget of the current user
+
+    While less than `reserve` percent of the budget remains the quota is low, results are
+    cached for longer and non-essential requests are skipped, see `low`.
+    """
+
+    def __init__(self, users, budget=10000, reserve=20):
+        self.users = users
+
+        self._budget = budget
+        self._reserve = reserve
+
+        self._ledger = QuotaLedger()
+
+        self._day = None
+        self._used = 0
+        self._read = 0
+        self._low = False
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self):
+        return int(self._budget)
+
+    @property
+    def reserve(self):
+        return int(self._reserve)
+
+    @property
+    def used(self):
+        with self._lock:
+            day = today()
+            if day != self._day or time.time() - self._read > USED_TTL:
+                self._used = self._ledger.used(day, self.users.uuid)
+                self._day = day
+                self._read = time.time()
+
+            return self._used
+
+    @property
+    def remaining(self):
+        return self.budget - self.used
+
+    @property
+    def low(self):
+        """
+        :return: whether less than `reserve` percent of the budget remains,
+                 always False without a budget
+        :rtype: bool
+        """
+        if self.budget <= 0:
+            return False
+
+        return self.remaining < self.budget * self.reserve / 100.0
+
+    def ttl_factor(self):
+        """
+        Passed to the memoizer as its `LIMIT_FACTOR`, so the quota is checked on each call
+
+        :return: factor memoized results are cached longer by
+        :rtype: int
+        """
+        low = self.low
+        if low and not self._low:
+            LOG.warning('API quota is low: %d of %d units remaining' %
+                        (self.remaining, self.budget))
+        self._low = low
+
+        return LOW_QUOTA_TTL_FACTOR if low else 1
+
+    def record(self, charges):
+        """
+        :param charges: requests and units by endpoint, see `flush`
+        :type charges: dict
+        """
+        if not charges:
+            return
+
+        day = today()
+
+        try:
+            self._ledger.record(day, self.users.uuid, charges)
+        except:  # pylint: disable=bare-except
+            return
+
+        with self._lock:
+            if day == self._day:
+                self._used += sum(units for _, units in charges.values())
+
+    def record_pending(self):
+        """
+        Record the requests charged on this thread since the last flush, see `charge`
+        """
+        self.record(flush())
+
+    def usage(self):
+        return self._ledger.usage(today(), self.users.uuid)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+import time
+
+from tubed_api import oauth  # pylint: disable=import-error
+
+from ..constants import ONE_MINUTE
+from ..lib.logger import Log
+from ..storage.users import UserStorage
+from .api import set_credentials
+
+LOG = Log('api', __file__)
+
+# the service refreshes access tokens expiring within this many seconds, well ahead of
+# auth.REFRESH_MARGIN so plugin and script invocations find a fresh token
+SERVICE_REFRESH_MARGIN = ONE_MINUTE * 5
+
+# seconds to wait before retrying a user whose refresh failed
+RETRY_AFTER = ONE_MINUTE
+
+
+class TokenRefresher:
+    """
+    Refreshes the access tokens of every user before they expire, run by the service.
+    Refreshed tokens are saved to the user storage, which other processes reload when it
+    changed, plugin and script invocations only refresh a token if the service didn't.
+    """
+
+    def __init__(self, margin=SERVICE_REFRESH_MARGIN):
+        self.margin = margin
+
+        self.users = UserStorage()
+        self._client = None
+
+        # user uuid: timestamp of the next attempt after a failed refresh
+        self._retry = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            set_credentials()
+            self._client = oauth.Client()
+        return self._client
+
+    def run(self):
+        """
+        Refresh the access tokens that are about to expire
+
+        :return: number of refreshed tokens
+        :rtype: int
+        """
+        self.users.load()
+
+        refreshed = 0
+        for user in self.users.users:
+            if self._due(user) and self._refresh(user):
+                refreshed += 1
+
+        return refreshed
+
+    def _due(self, user):
+        if not user.get('refresh_token') or not user.get('access_token'):
+            return False
+
+        try:
+            token_expiry = float(user.get('token_expiry', -1))
+        except ValueError:
+            return False
+
+        # in this case no expiration date was set
+        if token_expiry == -1:
+            return False
+
+        now = time.time()
+        if self._retry.get(user['uuid'], 0) > now:
+            return False
+
+        return token_expiry <= now + self.margin
+
+    def _refresh(self, user):
+        try:
+            access_token, expiry = self.client.refresh_token(user['refresh_token'])
+        except:  # pylint: disable=bare-except
+            access_token, expiry = '', 0
+
+        if not access_token:
+            LOG.error('Failed to refresh the access token of user %s' % user['uuid'])
+            self._retry[user['uuid']] = time.time() + RETRY_AFTER
+            return False
+
+        self._retry.pop(user['uuid'], None)
+
+        if not self.users.update_tokens(user['uuid'], access_token, time.time() + int(expiry)):
+            return False
+
+        LOG.debug('Refreshed the access token of user %s' % user['uuid'])
+        return True
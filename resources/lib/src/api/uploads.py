@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+from ..storage.uploads_playlists import UploadsPlaylists
+
+# fields requested from an uploads playlist, the items resolve like search results
+UPLOADS_FIELDS = 'items(kind,id,snippet(playlistId,resourceId/videoId))'
+
+
+def uploads_playlist(api, channel_id):
+    """
+    Find the uploads playlist of a channel, remembered once found
+
+    :param api: api instance
+    :type api: API
+    :param channel_id: channel id or 'mine'
+    :type channel_id: str
+    :return: id of the uploads playlist, '' if it couldn't be found
+    :rtype: str
+    """
+    if channel_id == 'mine':
+        payload = api.channel_by_username('mine')
+        try:
+            channel_id = payload.get('items', [{}])[0].get('id', '')
+        except IndexError:
+            channel_id = ''
+
+        if not channel_id:
+            return ''
+
+    uploads = UploadsPlaylists()
+
+    playlist_id = uploads.get(channel_id)
+    if playlist_id:
+        return playlist_id
+
+    if channel_id.startswith('UC'):
+        # the uploads playlist shares the channel's id with a UU prefix
+        playlist_id = 'UU' + channel_id[2:]
+
+    else:
+        payload = api.channels(channel_id, fields='items(contentDetails(relatedPlaylists))')
+        try:
+            channel_item = payload.get('items', [{}])[0]
+        except IndexError:
+            channel_item = {}
+
+        playlist_id = channel_item.get('contentDetails', {}) \
+            .get('relatedPlaylists', {}).get('uploads', '')
+
+    if playlist_id:
+        uploads.update(channel_id, playlist_id)
+
+    return playlist_id
@@ -191,4 +191,6 @@ STRINGS = {
     'Would you like to enable InputStream Adaptive now?': 30255,
     'Settings': 30256,
     'No entries found': 30257,
+    'Go to page...': 30262,
+    'Enter a page number': 30263,
 }
@@ -11,7 +11,6 @@
 import json
 from html import unescape
 
-import arrow
 import xbmc  # pylint: disable=import-error
 
 from ..constants.demo import VIDEO_ITEM
@@ -58,6 +57,8 @@ def add_related_video_to_playlist(context, video_id, demo=False):
         return _item, _page_token
 
     def _metadata(_video_id):
+        import arrow  # pylint: disable=import-outside-toplevel
+
         if demo:
             cached_video = VIDEO_ITEM
 
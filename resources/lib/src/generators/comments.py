@@ -10,8 +10,6 @@
 
 from copy import deepcopy
 
-import arrow
-
 from ..api.utils import formatted_comment
 from ..constants import ADDON_ID
 from ..constants import MODES
@@ -22,6 +20,8 @@ from ..lib.url_utils import create_addon_path
 
 
 def thread_generator(context, items):
+    import arrow  # pylint: disable=import-outside-toplevel
+
     for item in items:
         kind = item.get('kind', '')
 
@@ -99,6 +99,8 @@ def thread_generator(context, items):
 
 
 def comment_generator(context, items):
+    import arrow  # pylint: disable=import-outside-toplevel
+
     for item in items:
         kind = item.get('kind', '')
 
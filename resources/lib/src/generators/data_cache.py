@@ -8,6 +8,10 @@
     See LICENSES/GPL-2.0-only.txt for more information.
 """
 
+import threading
+from collections import Counter
+
+from ..constants import ONE_DAY
 from ..constants import ONE_WEEK
 from ..lib.logger import Log
 from ..storage.data_cache import DataCache
@@ -15,43 +19,78 @@ from . import utils
 
 LOG = Log('generators', __file__)
 
+# deleted, private or terminated content isn't requested again for this long
+TOMBSTONE_TTL = ONE_DAY
+
+# the api accepts at most this many ids per request
+MAX_IDS_PER_REQUEST = 50
+
+# ids skipped for a tombstone instead of being requested, by endpoint, see `tombstone_info`
+SKIPPED = Counter()
+SKIPPED_LOCK = threading.Lock()
+
+
+def tombstone_info():
+    """
+    :return: ids skipped for a tombstone by this process, by endpoint name
+    :rtype: dict
+    """
+    with SKIPPED_LOCK:
+        return dict(SKIPPED)
 
-def get_cached(context, endpoint, content_ids, parameters=None, cache_ttl=4):
+
+def get_cached(context, endpoint, content_ids, parameters=None, cache_ttl=4,
+               cached_only=False):
     cache = DataCache(context)
 
     payload = {}
 
-    cached_ids = []
     uncached_ids = []
 
     cached_content = cache.get_items(ONE_WEEK * cache_ttl, content_ids)
     for content_id in content_ids:
         if not cached_content.get(content_id):
             uncached_ids.append(content_id)
-        else:
-            cached_ids.append(content_id)
 
     payload.update(cached_content)
-    LOG.debug('Caching: \n  Cached Items: %s\n  Uncached Items: %s' % (cached_ids, uncached_ids))
+    cached = len(content_ids) - len(uncached_ids)
+
+    skipped = 0
+    if uncached_ids:
+        missing_ids = cache.get_tombstones(TOMBSTONE_TTL, uncached_ids)
+        if missing_ids:
+            skipped = len(uncached_ids)
+            uncached_ids = [content_id for content_id in uncached_ids
+                            if content_id not in missing_ids]
+            skipped -= len(uncached_ids)
+
+            with SKIPPED_LOCK:
+                SKIPPED[getattr(endpoint, '__name__', 'endpoint')] += skipped
+
+    LOG.debug('Caching: %d cached, %d uncached, %d skipped' %
+              (cached, len(uncached_ids), skipped))
 
-    if len(uncached_ids) > 0:
+    if len(uncached_ids) > 0 and not cached_only:
         uncached_data = {}
+        missing_ids = []
 
-        if parameters and isinstance(parameters, dict):
-            api_payload = endpoint(uncached_ids, **parameters)
-        else:
-            api_payload = endpoint(uncached_ids)
+        for chunk, api_payload in _fetch(context, endpoint, uncached_ids, parameters):
+            for item in api_payload.get('items', []):
+                content_id = str(item['id'])
+                uncached_data[content_id] = item
+                payload[content_id] = item
 
-        cached_ids = []
-        items = api_payload.get('items', [])
-        for item in items:
-            content_id = str(item['id'])
-            cached_ids.append(content_id)
-            uncached_data[content_id] = item
-            payload[content_id] = item
+            # only trust a successful response to mean the remaining ids don't exist
+            if 'error' not in api_payload and 'items' in api_payload:
+                missing_ids += [content_id for content_id in chunk
+                                if content_id not in uncached_data]
 
         cache.set_all(uncached_data)
-        LOG.debug('Caching: \n  Cached Items: %s' % cached_ids)
+        LOG.debug('Caching: %d cached' % len(uncached_data))
+
+        if missing_ids:
+            cache.set_tombstones(missing_ids)
+            LOG.debug('Caching: \n  Missing Items: %s' % missing_ids)
 
     return payload
 
@@ -59,10 +98,41 @@ def get_cached(context, endpoint, content_ids, parameters=None, cache_ttl=4):
 def get_fanart(context, endpoint, channel_ids, cache_ttl=4):
     channel_ids = list(set(channel_ids))
 
-    channels = get_cached(context, endpoint, channel_ids, cache_ttl)
+    # fanart is only decoration, don't request it while the quota is low
+    channels = get_cached(context, endpoint, channel_ids, cache_ttl=cache_ttl,
+                          cached_only=context.api.quota.low)
 
     payload = {}
     for channel_id, channel in channels.items():
         payload[channel_id] = utils.get_fanart(channel.get('brandingSettings', {}))
 
     return payload
+
+
+def _fetch(context, endpoint, content_ids, parameters=None):
+    """
+    Request the content ids in chunks of MAX_IDS_PER_REQUEST, concurrently when there is
+    more than one chunk
+
+    :return: list of (chunk, api payload)
+    :rtype: list
+    """
+    if not parameters or not isinstance(parameters, dict):
+        parameters = {}
+
+    chunks = [content_ids[index:index + MAX_IDS_PER_REQUEST]
+              for index in range(0, len(content_ids), MAX_IDS_PER_REQUEST)]
+
+    if len(chunks) == 1:
+        return [(chunks[0], endpoint(chunks[0], **parameters))]
+
+    # refresh an expired token once instead of in every branch
+    api = getattr(endpoint, '__self__', None)
+    if api is not None and hasattr(api, 'refresh_token'):
+        api.refresh_token()
+
+    name = getattr(endpoint, '__name__', 'endpoint')
+    tasks = [context.executor.submit('%s[%d]' % (name, index), endpoint, chunk, **parameters)
+             for index, chunk in enumerate(chunks)]
+
+    return list(zip(chunks, context.executor.gather(*tasks)))
@@ -21,6 +21,7 @@ from ..lib.url_utils import create_addon_path
 from ..storage.users import UserStorage
 from .data_cache import get_cached
 from .data_cache import get_fanart
+from .utils import get_owner_channel_ids
 from .utils import get_thumbnail
 
 users = UserStorage()
@@ -30,20 +31,34 @@ del users
 
 
 def playlist_generator(context, items):
-    cached_playlists = get_cached(
-        context,
-        context.api.playlists,
-        [get_id(item) for item in items if get_id(item)],
-        cache_ttl=context.settings.data_cache_ttl
-    )
-
-    fanart = get_fanart(
-        context,
-        context.api.channels,
-        [item.get('snippet', {}).get('channelId')
-         for _, item in cached_playlists.items() if item.get('snippet', {}).get('channelId')],
-        cache_ttl=context.settings.data_cache_ttl
-    )
+    executor = context.executor
+
+    tasks = [
+        executor.submit('playlists', get_cached, context, context.api.playlists,
+                        [get_id(item) for item in items if get_id(item)],
+                        cache_ttl=context.settings.data_cache_ttl),
+    ]
+
+    # search results and playlists already carry their channel, fetch the fanart alongside
+    channel_ids = get_owner_channel_ids(items, ['youtube#playlist', 'youtube#searchResult'])
+    if channel_ids is not None:
+        tasks.append(executor.submit('fanart', get_fanart, context, context.api.channels,
+                                     channel_ids, cache_ttl=context.settings.data_cache_ttl))
+
+    payload = executor.gather(*tasks)
+    cached_playlists = payload[0]
+
+    if channel_ids is not None:
+        fanart = payload[1]
+    else:
+        fanart = get_fanart(
+            context,
+            context.api.channels,
+            [item.get('snippet', {}).get('channelId')
+             for _, item in cached_playlists.items()
+             if item.get('snippet', {}).get('channelId')],
+            cache_ttl=context.settings.data_cache_ttl
+        )
 
     is_mine = context.query.get('channel_id', '') == 'mine'
 
@@ -56,3 +56,27 @@ def get_chapters(description):
         chapters.append((timestamp_seconds, timestamp_label, title))
 
     return chapters
+
+
+def get_owner_channel_ids(items, kinds):
+    """
+    Channel ids of the items' owners, available before the items are looked up
+
+    :param items: api items
+    :type items: list
+    :param kinds: item kinds whose snippet.channelId is the owner of the content,
+                  ie. youtube#video and youtube#searchResult
+    :type kinds: list
+    :return: channel ids, or None if any item is of another kind or has no channel id
+    :rtype: list | None
+    """
+    payload = []
+
+    for item in items:
+        channel_id = item.get('snippet', {}).get('channelId')
+        if item.get('kind') not in kinds or not channel_id:
+            return None
+
+        payload.append(channel_id)
+
+    return payload
@@ -12,8 +12,6 @@ from copy import deepcopy
 from html import unescape
 from urllib.parse import quote
 
-import arrow
-
 from ..constants import ADDON_ID
 from ..constants import MODES
 from ..constants import SCRIPT_MODES
@@ -26,6 +24,7 @@ from ..storage.users import UserStorage
 from .data_cache import get_cached
 from .data_cache import get_fanart
 from .utils import get_chapters
+from .utils import get_owner_channel_ids
 from .utils import get_thumbnail
 
 
@@ -35,20 +34,33 @@ def video_generator(context, items, mine=False):
     if context.mode == str(MODES.LIVE):
         event_type = context.query.get('event_type', '')
 
-    cached_videos = get_cached_videos(context, items, event_type)
+    executor = context.executor
+
+    tasks = [
+        executor.submit('videos', get_cached_videos, context, items, event_type),
+        executor.submit('channel mine', _has_channel_mine, context),
+    ]
 
-    fanart = get_fanart(
-        context,
-        context.api.channels,
-        [item.get('snippet', {}).get('channelId')
-         for _, item in cached_videos.items()
-         if item.get('snippet', {}).get('channelId')],
-        cache_ttl=context.settings.data_cache_ttl
-    )
+    # search results and videos already carry their channel, fetch the fanart alongside
+    channel_ids = get_owner_channel_ids(items, ['youtube#video', 'youtube#searchResult'])
+    if channel_ids is not None:
+        tasks.append(executor.submit('fanart', get_fanart, context, context.api.channels,
+                                     channel_ids, cache_ttl=context.settings.data_cache_ttl))
 
-    has_channel_mine = False
-    if context.api.logged_in:
-        has_channel_mine = context.api.channel_by_username('mine') != {}
+    payload = executor.gather(*tasks)
+    cached_videos, has_channel_mine = payload[0], payload[1]
+
+    if channel_ids is not None:
+        fanart = payload[2]
+    else:
+        fanart = get_fanart(
+            context,
+            context.api.channels,
+            [item.get('snippet', {}).get('channelId')
+             for _, item in cached_videos.items()
+             if item.get('snippet', {}).get('channelId')],
+            cache_ttl=context.settings.data_cache_ttl
+        )
 
     users = UserStorage()
 
@@ -113,6 +125,57 @@ def video_generator(context, items, mine=False):
         yield tuple(payload)
 
 
+def playlist_item_generator(items):
+    """
+    Playable items built only from the playlist items' own snippets, without looking up the
+    videos, fanart or context menus. Used to queue videos quickly, the full metadata is
+    resolved when each video is played.
+    """
+    uuid = UserStorage().uuid
+
+    for item in items:
+        video_id = get_id(item)
+
+        if not video_id:
+            continue
+
+        snippet = item.get('snippet', {})
+
+        # deleted and private videos are listed without thumbnails
+        if not snippet.get('thumbnails'):
+            continue
+
+        video_title = unescape(snippet.get('title', ''))
+        channel_name = unescape(snippet.get('videoOwnerChannelTitle', ''))
+
+        payload = Video(
+            label=video_title,
+            label2=channel_name,
+            path=create_addon_path({
+                'mode': str(MODES.PLAY),
+                'video_id': video_id,
+                'uuid': uuid
+            })
+        )
+
+        payload.ListItem.setInfo('video', {
+            'mediatype': 'video',
+            'originaltitle': video_title,
+            'sorttitle': video_title,
+            'studio': channel_name,
+        })
+
+        thumbnail = get_thumbnail(snippet)
+        payload.ListItem.setArt({
+            'icon': thumbnail,
+            'thumb': thumbnail,
+        })
+
+        payload.ListItem.setProperty('video_id', video_id)
+
+        yield tuple(payload)
+
+
 def get_id(item):
     kind = item.get('kind', '')
     if kind == 'youtube#video':
@@ -129,6 +192,8 @@ def get_id(item):
 
 
 def get_info_labels(video, snippet):
+    import arrow  # pylint: disable=import-outside-toplevel
+
     content_details = video.get('contentDetails', {})
     statistics = video.get('statistics', {})
 
@@ -222,6 +287,10 @@ def get_cached_videos(context, items, event_type):
     return cached_videos
 
 
+def _has_channel_mine(context):
+    return context.api.has_channel
+
+
 def get_context_menu(context, users, item, video_id, video_title, channel_id,  # pylint: disable=too-many-arguments
                      channel_name, event_type, mine, has_channel_mine, chapters):
     logged_in = context.api.logged_in
@@ -276,8 +345,10 @@ def get_context_menu(context, users, item, video_id, video_title, channel_id,  #
             if mine and snippet and playlist_id:
                 context_menus += [
                     (context.i18n('Remove from playlist'),
-                     'RunScript(%s,mode=%s&action=remove&playlistitem_id=%s&video_title=%s)' %
-                     (ADDON_ID, str(SCRIPT_MODES.PLAYLIST), item['id'], quote(video_title)))
+                     'RunScript(%s,mode=%s&action=remove&playlistitem_id=%s'
+                     '&playlist_id=%s&video_title=%s)' %
+                     (ADDON_ID, str(SCRIPT_MODES.PLAYLIST), item['id'],
+                      playlist_id, quote(video_title)))
                 ]
 
     if context.settings.favorite_channel_maximum > 0:
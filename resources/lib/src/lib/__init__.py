@@ -8,6 +8,7 @@
     See LICENSES/GPL-2.0-only.txt for more information.
 """
 
-__all__ = ['cache', 'context', 'database', 'logger', 'memoizer', 'pickle', 'playback',
-           'privacy_policy', 'routing', 'settings', 'sql_storage', 'time', 'translation',
-           'txt_fmt', 'url_utils', 'utils', 'zip_utils']
+__all__ = ['cache', 'codec', 'context', 'database', 'executor', 'fields', 'file_lock',
+           'function_cache', 'import_profile', 'logger', 'memoizer', 'memory_cache', 'pickle',
+           'playback', 'privacy_policy', 'routing', 'session', 'settings', 'sql_storage', 'time',
+           'translation', 'txt_fmt', 'url_utils', 'utils', 'zip_utils']
@@ -11,54 +11,121 @@
     See LICENSES/GPL-2.0-only.txt for more information.
 """
 
-import json
-import pickle
+import sqlite3
+import time
 
+from . import codec
+from .database import MAX_VARIABLES
 from .database import Database
-from .time import now
-from .time import timestamp_diff
+from .database import chunks
 
 
 class Cache(Database):
+    """
+    Json serializable items stored with `lib.codec`, rows written by older versions are
+    rewritten in place the first time they are read
+
+    Reads are recorded in `last_access` in batches, the least recently used items are
+    evicted first once the cache exceeds its size budget.
+    """
+    # 1: epoch integer timestamps, 2: last_access column
+    _schema_version = 2
+
+    _eviction_order = 'COALESCE(last_access, time) ASC'
+
+    # pending reads are written once there are this many, or when the cache is written/released
+    _access_batch_size = 250
 
     def __init__(self, filename, max_file_size_mb=5):
         super().__init__(filename, max_file_size_kb=max_file_size_mb * 1024)
 
+        self._accessed = {}
+
+    def __del__(self):
+        try:
+            self._flush_access()
+        except:  # pylint: disable=bare-except
+            pass
+
+        super().__del__()
+
     def is_empty(self):
         return self._is_empty()
 
     def get_items(self, seconds, content_ids):
-        self._open()
-
-        result = self._execute(
-            False,
-            'SELECT * FROM %s WHERE key IN (%s)' %
-            (self.table_name, ','.join(['?' for _ in content_ids])),
-            [str(item) for item in content_ids]
+        result = self._get_many(
+            [str(item) for item in content_ids],
+            oldest=self._timestamp() - int(seconds),
+            decode=False
         )
 
         payload = {}
-        if result:
-            for item in result:
-                diff_seconds = timestamp_diff(item[1] if item[1] is not None else now())
-                if diff_seconds <= seconds:
-                    payload[str(item[0])] = json.loads(pickle.loads(item[2]))
+        legacy = []
+        for key, (value, timestamp) in result.items():
+            if codec.is_tombstone(value):
+                continue
+
+            try:
+                payload[str(key)] = self._decode(value)
+            except:  # pylint: disable=bare-except
+                continue
+
+            if codec.is_legacy(value):
+                legacy.append((key, payload[str(key)], timestamp))
+
+        if legacy:
+            self._rewrite(legacy)
+
+        self._touch(payload.keys())
 
-        self._close()
         return payload
 
     def get_item(self, seconds, content_id):
-        content_id = str(content_id)
-        result = self._get(content_id)
+        return self.get_items(seconds, [content_id])
+
+    def get_tombstones(self, seconds, content_ids):
+        """
+        :param seconds: maximum age of the tombstones
+        :type seconds: int
+        :param content_ids: ids to check
+        :type content_ids: list
+        :return: ids marked as not existing within the last `seconds`
+        :rtype: list
+        """
+        content_ids = [str(item) for item in content_ids]
+        if not content_ids:
+            return []
+
+        oldest = self._timestamp() - int(seconds)
+        payload = []
 
-        payload = {}
-        if result:
-            diff_seconds = timestamp_diff(result[1] if result[1] is not None else now())
-            if diff_seconds <= seconds:
-                payload[content_id] = json.loads(result[0])
+        self._open()
 
+        for chunk in chunks(content_ids, MAX_VARIABLES):
+            result = self._execute(
+                False,
+                'SELECT key FROM %s WHERE key IN (%s) AND time >= ? AND value = ?' %
+                (self.table_name, ','.join(['?' for _ in chunk])),
+                chunk + [oldest, sqlite3.Binary(codec.TOMBSTONE)]
+            )
+
+            if result is not None:
+                payload += [str(item[0]) for item in result]
+
+        self._close()
         return payload
 
+    def set_tombstones(self, content_ids):
+        """
+        Mark ids as not existing, ie. deleted or private videos, tombstones are never returned
+        by `get_items`
+
+        :param content_ids: ids that the api didn't return
+        :type content_ids: list
+        """
+        self._flush_access()
+        self._set_many((str(content_id), None) for content_id in content_ids)
+
     def set(self, content_id, item):
         self._set(content_id, item)
 
@@ -66,41 +133,109 @@ class Cache(Database):
         self._set_all(items)
 
     def clear(self):
+        self._accessed = {}
         self._clear()
 
+    def delete(self):
+        self._accessed = {}
+        return self._delete()
+
     def remove(self, content_id):
         self._remove(content_id)
 
     def update(self, content_id, item):
-        self._set(str(content_id), json.dumps(item))
+        self._set(str(content_id), item)
 
     def _optimize_item_count(self):
         pass
 
+    @staticmethod
+    def _timestamp():
+        return int(time.time())
+
+    def _create_table(self):
+        if not self.table_created:
+            self._execute(
+                True,
+                'CREATE TABLE IF NOT EXISTS %s (key TEXT PRIMARY KEY, '
+                'time INTEGER, value BLOB)' % self.table_name
+            )
+            self._migrate()
+            self._execute(
+                True,
+                'CREATE INDEX IF NOT EXISTS %s_time ON %s (time)' %
+                (self.table_name, self.table_name)
+            )
+            self.table_created = True
+
+    def _upgrade(self, version):
+        if version < 1:
+            # datetime strings were written in local time
+            self._execute(
+                True,
+                "UPDATE %s SET time = CAST(strftime('%%s', time, 'utc') AS INTEGER) "
+                "WHERE typeof(time) = 'text'" % self.table_name
+            )
+
+        if version < 2:
+            self._execute(
+                True,
+                'ALTER TABLE %s ADD COLUMN last_access INTEGER' % self.table_name
+            )
+
+    def _touch(self, content_ids):
+        timestamp = self._timestamp()
+        for content_id in content_ids:
+            self._accessed[content_id] = timestamp
+
+        if len(self._accessed) >= self._access_batch_size:
+            self._flush_access()
+
+    def _flush_access(self):
+        if not self._accessed:
+            return
+
+        accessed = self._accessed
+        self._accessed = {}
+
+        with self._transaction():
+            self._execute_many(
+                'UPDATE %s SET last_access=? WHERE key=?' % self.table_name,
+                [(timestamp, content_id) for content_id, timestamp in accessed.items()]
+            )
+
     def _set(self, content_id, item):  # pylint: disable=arguments-differ
+        self._flush_access()
         self._open()
 
         self._execute(
             True,
             'REPLACE INTO %s (key,time,value) VALUES(?,?,?)' % self.table_name,
-            values=[content_id, now(), self._encode(item)]
+            values=[content_id, self._timestamp(), self._encode(item)]
         )
 
         self._close()
         self._optimize_file_size()
 
     def _set_all(self, items):
-
-        needs_commit = True
-
-        query = 'REPLACE INTO %s (key,time,value) VALUES(?,?,?)' % self.table_name
-
-        self._open()
-
-        for key in list(items.keys()):
-            item = items[key]
-            self._execute(needs_commit, query, values=[key, now(), self._encode(json.dumps(item))])
-            needs_commit = False
-
-        self._close()
-        self._optimize_file_size()
+        self._flush_access()
+        self._set_many(items)
+
+    def _rewrite(self, items):
+        # re-encode (key, item, time) keeping the time they were written
+        with self._transaction():
+            self._execute_many(
+                'UPDATE %s SET value=? WHERE key=? AND time=?' % self.table_name,
+                [(self._encode(item), key, timestamp) for key, item, timestamp in items]
+            )
+
+    @staticmethod
+    def _encode(obj):
+        if obj is None:
+            return sqlite3.Binary(codec.TOMBSTONE)
+
+        return sqlite3.Binary(codec.encode(obj))
+
+    @staticmethod
+    def _decode(obj):
+        return codec.decode(obj)
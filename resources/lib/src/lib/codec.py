@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+import json
+import pickle
+import zlib
+
+# payloads are prefixed with a one byte marker identifying the codec they were encoded with,
+# payloads without a known marker are legacy pickled json strings
+JSON = b'J'
+ZLIB_JSON = b'Z'
+TOMBSTONE = b'T'
+
+# json payloads larger than this are compressed. decompressing costs about as much as
+# decoding the json again, so typical resources (2-5 KiB) are stored as plain json and only
+# outliers like videos with very long descriptions are compressed
+COMPRESS_THRESHOLD = 8192
+
+
+def _encode_json(obj):
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def _decode_json(payload):
+    return json.loads(payload.decode('utf-8'))
+
+
+def _decode_zlib_json(payload):
+    return _decode_json(zlib.decompress(payload))
+
+
+def _decode_legacy(payload):
+    return json.loads(pickle.loads(payload))
+
+
+def _decode_tombstone(_):
+    return None
+
+
+DECODERS = {
+    JSON: _decode_json,
+    ZLIB_JSON: _decode_zlib_json,
+    TOMBSTONE: _decode_tombstone,
+}
+
+
+def encode(obj, threshold=COMPRESS_THRESHOLD):
+    """
+    Encode a json serializable object, compressed when larger than the threshold
+
+    :param obj: json serializable object
+    :param threshold: size in bytes above which the payload is compressed, -1 to never compress
+    :type threshold: int
+    :return: marker prefixed payload
+    :rtype: bytes
+    """
+    payload = _encode_json(obj)
+
+    if 0 <= threshold < len(payload):
+        return ZLIB_JSON + zlib.compress(payload, 1)
+
+    return JSON + payload
+
+
+def decode(payload):
+    """
+    Decode a payload created by `encode` or a legacy pickled json string
+
+    :param payload: encoded payload
+    :type payload: bytes
+    :return: decoded object
+    """
+    payload = bytes(payload)
+
+    decoder = DECODERS.get(payload[:1])
+    if decoder is None:
+        return _decode_legacy(payload)
+
+    return decoder(payload[1:])
+
+
+def is_legacy(payload):
+    """
+    :param payload: encoded payload
+    :type payload: bytes
+    :return: whether the payload predates the codec markers and should be rewritten
+    :rtype: bool
+    """
+    return bytes(payload[:1]) not in DECODERS
+
+
+def is_tombstone(payload):
+    """
+    :param payload: encoded payload
+    :type payload: bytes
+    :return: whether the payload marks an item that doesn't exist
+    :rtype: bool
+    """
+    return bytes(payload[:1]) == TOMBSTONE
@@ -9,9 +9,12 @@
 """
 
 import sys
+import threading
+from importlib import import_module
 
 import xbmcaddon  # pylint: disable=import-error
 
+from .executor import Executor
 from .settings import Settings
 from .translation import Translator
 
@@ -25,12 +28,42 @@ class Context:
         self._query = {}
 
         self._api = None
+        self._api_lock = threading.Lock()
 
         self._addon = None
 
         self._settings = None
         self._translator = None
 
+        self._executor = None
+
+    @property
+    def has_api(self):
+        return self._api is not None
+
+    def reset(self, api=False, settings=False):
+        """
+        Clear the arguments of the previous invocation from a reused context
+
+        :param api: drop the api, it is constructed again on first use
+        :type api: bool
+        :param settings: drop the addon, settings, translator and api
+        :type settings: bool
+        """
+        self._argv = None
+        self._handle = -1
+        self._mode = None
+        self._query = {}
+
+        if settings:
+            self._addon = None
+            self._settings = None
+            self._translator = None
+            api = True
+
+        if api:
+            self._api = None
+
     @property
     def argv(self):
         if self._argv is None:
@@ -59,6 +92,22 @@ class Context:
 
     @property
     def api(self):
+        """
+        API instance, constructed on first use. Routes that never reach the api
+        don't import the api client or read the users.
+
+        :rtype: API
+        """
+        if self._api is None:
+            with self._api_lock:
+                if self._api is None:
+                    # imported by name, the api imports the context for its settings
+                    api = import_module('..api', __package__)
+                    self._api = api.API(
+                        language=self.settings.language,
+                        region=self.settings.region
+                    )
+
         return self._api
 
     @api.setter
@@ -77,6 +126,12 @@ class Context:
             self._settings = Settings(self.addon)
         return self._settings
 
+    @property
+    def executor(self):
+        if not self._executor:
+            self._executor = Executor()
+        return self._executor
+
     def i18n(self, string_id):
         if not self._translator:
             self._translator = Translator(self.addon)
@@ -11,31 +11,256 @@
     See LICENSES/GPL-2.0-only.txt for more information.
 """
 
+import math
 import os
 import pickle
 import sqlite3
+import threading
 import time
+from contextlib import closing
+from uuid import uuid4
 
 import xbmcvfs  # pylint: disable=import-error
 
 from .time import now
 
+# milliseconds a connection waits for locks held by other processes
+BUSY_TIMEOUT = 20000
+
+
+class Connection:
+    """
+    A sqlite3 connection that is shared by every Database using the same file
+
+    Write transactions hold the connection's lock from BEGIN until COMMIT/ROLLBACK so
+    statements from other threads never end up in another thread's transaction.
+    """
+
+    def __init__(self, filename):
+        path = os.path.dirname(filename)
+        if not xbmcvfs.exists(path):
+            xbmcvfs.mkdirs(path)
+
+        self.filename = filename
+        self.generation = generation(filename)
+
+        # sqlite3 keeps prepared statements per connection, keyed on the query string
+        self.handle = sqlite3.connect(filename, check_same_thread=False, detect_types=0,
+                                      timeout=1, isolation_level=None, cached_statements=256)
+        self.handle.execute('PRAGMA journal_mode=WAL')
+        self.handle.execute('PRAGMA synchronous=NORMAL')
+        self.handle.execute('PRAGMA busy_timeout=%d' % BUSY_TIMEOUT)
+
+        self.lock = threading.RLock()
+        self.tables = set()
+
+        self.closed = False
+
+        self._local = threading.local()
+
+    @property
+    def depth(self):
+        return getattr(self._local, 'depth', 0)
+
+    @depth.setter
+    def depth(self, value):
+        self._local.depth = max(int(value), 0)
+
+    @property
+    def transaction(self):
+        return getattr(self._local, 'transaction', False)
+
+    def execute(self, query, values=None):
+        with self.lock:
+            return self.handle.execute(query, values or [])
+
+    def executemany(self, query, values):
+        with self.lock:
+            return self.handle.executemany(query, values)
+
+    def begin(self):
+        # held until the transaction is committed or rolled back, see _end
+        self.lock.acquire()  # pylint: disable=consider-using-with
+        try:
+            self.handle.execute('BEGIN IMMEDIATE')
+            self._local.transaction = True
+        except:
+            self.lock.release()
+            raise
+
+    def commit(self):
+        self._end('COMMIT')
+
+    def rollback(self):
+        self._end('ROLLBACK')
+
+    def checkpoint(self):
+        """
+        Move the write-ahead log into the database file and truncate it, waits for readers
+        of other processes. Writes leave this to sqlite's automatic checkpoints.
+        """
+        with self.lock:
+            try:
+                self.handle.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            except sqlite3.Error:
+                pass
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.handle.close()
+
+    def _end(self, statement):
+        if not self.transaction:
+            return
+
+        try:
+            self.handle.execute(statement)
+        finally:
+            self._local.transaction = False
+            self.lock.release()
+
+
+class ConnectionManager:
+    """
+    Keeps one Connection per database file for the lifetime of the interpreter
+    """
+
+    def __init__(self):
+        self._connections = {}
+        self._lock = threading.Lock()
+
+        self.opened = 0
+
+    def get(self, filename):
+        with self._lock:
+            connection = self._connections.get(filename)
+            if connection is not None and not connection.closed and \
+                    connection.generation != generation(filename):
+                # restored or emptied by another process. not closed here, other threads
+                # may still be using it, it's closed when no longer referenced
+                connection = None
+
+            if connection is None or connection.closed:
+                connection = Connection(filename)
+                self._connections[filename] = connection
+                self.opened += 1
+
+            return connection
+
+    def close(self, filename=None):
+        with self._lock:
+            if filename is None:
+                connections = list(self._connections.values())
+                self._connections.clear()
+            else:
+                connections = [self._connections.pop(filename, None)]
+
+        for connection in connections:
+            if connection is not None:
+                connection.close()
+
+
+CONNECTIONS = ConnectionManager()
+
+# stay well below SQLITE_MAX_VARIABLE_NUMBER of older sqlite builds (999)
+MAX_VARIABLES = 500
+
+# suffix of the file marking a database's generation, see `bump_generation`
+GENERATION_SUFFIX = '-generation'
+
+
+def generation(filename):
+    """
+    :return: signature of the generation marker next to a database, changed by
+             `bump_generation`. None if the database was never restored or emptied
+    :rtype: tuple | None
+    """
+    try:
+        stat = os.stat(filename + GENERATION_SUFFIX)
+    except OSError:
+        return None
+
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def bump_generation(filename):
+    """
+    Replace the generation marker of a database, connections of every process reopen
+    the database on their next use, ie. to create tables dropped by a restore
+    """
+    marker = filename + GENERATION_SUFFIX
+    temp_marker = '%s.%s' % (marker, uuid4().hex)
+
+    try:
+        with open(temp_marker, 'w', encoding='utf-8') as file_handle:
+            file_handle.write(uuid4().hex)
+        # a new file, so the inode changes even within the file system's time resolution
+        os.replace(temp_marker, marker)
+    except OSError:
+        pass
+    finally:
+        if os.path.exists(temp_marker):
+            os.remove(temp_marker)
+
+
+def snapshot(filename, destination):
+    """
+    Copy a database, including the transactions still in its write-ahead log, while other
+    connections keep using it
+
+    :param filename: database to copy
+    :type filename: str
+    :param destination: file to copy to
+    :type destination: str
+    """
+    with closing(sqlite3.connect(filename, timeout=20)) as source, \
+            closing(sqlite3.connect(destination)) as target:
+        source.backup(target)
+
+
+def restore(filename, destination):
+    """
+    Replace the contents of a live database with a copy, connections of other processes
+    reopen it once they notice its new generation
+
+    :param filename: copy to restore
+    :type filename: str
+    :param destination: database to restore to
+    :type destination: str
+    """
+    with closing(sqlite3.connect(filename)) as source, \
+            closing(sqlite3.connect(destination, timeout=20, isolation_level=None)) as target:
+        source.backup(target)
+        target.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    CONNECTIONS.close(destination)
+    bump_generation(destination)
+
+
+def chunks(items, size):
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
 
 class Database:
+    # bump in subclasses that change their schema and implement _upgrade
+    _schema_version = 0
+
+    # rows evicted first when over the size budget come first in this order
+    _eviction_order = 'time ASC'
+
     def __init__(self, filename, max_item_count=0, max_file_size_kb=-1):
         self._table_name = 'storage'
 
         self._filename = ''.join([filename.replace('.sqlite', ''), '.sqlite'])
 
-        self._file = None
-        self._cursor = None
+        # connection and open depth of this instance, per thread
+        self._local = threading.local()
 
         self._max_item_count = max_item_count
         self._max_file_size_kb = max_file_size_kb
 
-        self._table_created = False
-        self._needs_commit = False
-
     @property
     def max_item_count(self):
         return int(self._max_item_count)
@@ -58,53 +283,80 @@ class Database:
 
     @property
     def table_created(self):
-        return bool(self._table_created)
+        return self._file is not None and self.table_name in self._file.tables
 
     @table_created.setter
     def table_created(self, value):
-        self._table_created = bool(value)
+        if self._file is None:
+            return
+
+        if value:
+            self._file.tables.add(self.table_name)
+        else:
+            self._file.tables.discard(self.table_name)
 
     @property
     def needs_commit(self):
-        return bool(self._needs_commit)
-
-    @needs_commit.setter
-    def needs_commit(self, value):
-        self._needs_commit = bool(value)
+        return self._file is not None and self._file.transaction
 
     @property
     def filename(self):
         return self._filename
 
+    @property
+    def _file(self):
+        return getattr(self._local, 'file', None)
+
+    @property
+    def _depth(self):
+        return getattr(self._local, 'depth', 0)
+
     def __del__(self):
-        self._close()
+        # only end what this instance opened, the connection is shared with other instances
+        while self._depth > 0:
+            self._close()
 
     def _open(self):
-        if self._file is None:
-            path = os.path.dirname(self.filename)
-            if not xbmcvfs.exists(path):
-                xbmcvfs.mkdirs(path)
+        if self._depth == 0:
+            # resolved on every outermost open, the manager replaces closed connections
+            self._local.file = CONNECTIONS.get(self.filename)
 
-            self._file = sqlite3.connect(self.filename, check_same_thread=False,
-                                         detect_types=0, timeout=1)
+        self._local.depth = self._depth + 1
+        self._file.depth += 1
 
-            self._file.isolation_level = None
-            self._cursor = self._file.cursor()
-            self._cursor.execute('PRAGMA journal_mode=MEMORY')
-            self._cursor.execute('PRAGMA busy_timeout=20000')
+        if not self.table_created:
             self._create_table()
 
     def _execute(self, needs_commit, query, values=None):
         if values is None:
             values = []
 
-        if not self.needs_commit and needs_commit:
-            self.needs_commit = True
-            self._cursor.execute('BEGIN')
+        if needs_commit and not self.needs_commit:
+            try:
+                self._file.begin()
+            except sqlite3.Error:
+                return None
+
+        for _ in range(3):
+            try:
+                return self._file.execute(query, values)
+            except TypeError:
+                return None
+            except:  # pylint: disable=bare-except
+                time.sleep(0.1)
+
+        return None
+
+    def _execute_many(self, query, values):
+        if not self.needs_commit:
+            try:
+                self._file.begin()
+            except sqlite3.Error:
+                return None
 
         for _ in range(3):
             try:
-                return self._cursor.execute(query, values)
+                return self._file.executemany(query, values)
             except TypeError:
                 return None
             except:  # pylint: disable=bare-except
@@ -113,62 +365,126 @@ class Database:
         return None
 
     def _close(self):
-        if self._file is not None:
+        if self._depth == 0:
+            return
+
+        self._local.depth = self._depth - 1
+        self._file.depth -= 1
+        if self._file.depth == 0:
             self._sync()
-            self._file.commit()
-            self._cursor.close()
-            self._cursor = None
-            self._file.close()
-            self._file = None
+
+            # don't keep a connection the manager may replace alive between uses
+            self._local.file = None
+
+    def _rollback(self):
+        if self._file is not None:
+            self._file.rollback()
+
+    def _transaction(self):
+        return Transaction(self)
+
+    def _delete(self):
+        """
+        Empty every table and shrink the file in place. The file isn't removed, other
+        processes may have it open and it can't be deleted while open on Windows
+        """
+        # VACUUM can't run inside a transaction
+        if self.needs_commit:
+            return False
+
+        self._open()
+        result = self._execute(
+            False, "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+        )
+        tables = [item[0] for item in result] if result is not None else []
+        self._close()
+
+        with self._transaction():
+            for table in tables:
+                self._execute(True, 'DELETE FROM %s' % table)
+
+        self._open()
+        success = self._execute(False, 'VACUUM') is not None
+        self._file.checkpoint()
+        self._close()
+
+        bump_generation(self.filename)
+
+        return success
 
     def _optimize_file_size(self):
         if self.max_file_size_kb <= 0:
             return
 
-        if not xbmcvfs.exists(self.filename):
-            return
+        self._open()
 
-        file_size_kb = (xbmcvfs.Stat(self.filename).st_size() // 1024)
-        if file_size_kb >= self.max_file_size_kb:
-            self._open()
+        size_kb = self._used_size_kb()
+        if size_kb > self.max_file_size_kb:
+            result = self._execute(False, 'SELECT COUNT(key) FROM %s' % self.table_name)
+            item = result.fetchone() if result is not None else None
+            item_count = int(item[0]) if item and item[0] else 0
 
-            result = self._execute(
-                False,
-                'SELECT COUNT(key) FROM %s' % self.table_name
-            )
+            if item_count:
+                # evict down to 90% of the budget so we aren't evicting on every write
+                excess_kb = size_kb - (self.max_file_size_kb * 0.9)
+                crop_count = min(item_count, int(math.ceil(excess_kb / (size_kb / item_count))))
 
-            item_count = result.fetchone()[0]
-            try:
-                item_count = int(item_count)
-            except ValueError:
-                item_count = 0
+                self._execute(
+                    True,
+                    'DELETE FROM %s WHERE key IN (SELECT key FROM %s ORDER BY %s LIMIT ?)' %
+                    (self.table_name, self.table_name, self._eviction_order),
+                    [crop_count]
+                )
 
-            crop_count = max(item_count, item_count - 150)
+        self._close()
 
-            result = self._execute(
-                True,
-                'DELETE FROM %s WHERE key in '
-                '(SELECT key FROM %s ORDER BY time DESC LIMIT -1 OFFSET %d)' %
-                (self.table_name, self.table_name, crop_count)
-            )
+    def _used_size_kb(self):
+        # pages in use, free pages are reused by later writes and don't count toward the budget
+        payload = []
+        for pragma in ['page_count', 'freelist_count', 'page_size']:
+            result = self._execute(False, 'PRAGMA %s' % pragma)
+            item = result.fetchone() if result is not None else None
+            payload.append(int(item[0]) if item else 0)
 
-            self._close()
+        page_count, freelist_count, page_size = payload
+        return ((page_count - freelist_count) * page_size) / 1024.0
 
     def _create_table(self):
-        self._open()
-
         if not self.table_created:
             self._execute(
                 True,
                 'CREATE TABLE IF NOT EXISTS %s (key TEXT PRIMARY KEY, '
                 'time TIMESTAMP, value BLOB)' % self.table_name
             )
+            self._migrate()
             self.table_created = True
 
+    def _migrate(self):
+        result = self._execute(False, 'PRAGMA user_version')
+        item = result.fetchone() if result is not None else None
+        version = item[0] if item else 0
+
+        if version >= self._schema_version:
+            return
+
+        self._upgrade(version)
+        self._execute(True, 'PRAGMA user_version = %d' % self._schema_version)
+
+    def _upgrade(self, version):
+        """
+        Upgrade the existing tables from `version` to `_schema_version`
+
+        :param version: schema version the file was written with, 0 for unversioned files
+        :type version: int
+        """
+
+    @staticmethod
+    def _timestamp():
+        return now()
+
     def _sync(self):
-        if self._cursor is not None and self.needs_commit:
-            self.needs_commit = False
-            self._execute(False, 'COMMIT')
+        if self.needs_commit:
+            self._file.commit()
 
     def _set(self, item_id, item):
         if self.max_file_size_kb < 1 and self.max_item_count < 1:
@@ -181,7 +497,7 @@ class Database:
         self._execute(
             True,
             'REPLACE INTO %s (key,time,value) VALUES(?,?,?)' % self.table_name,
-            values=[item_id, now(), self._encode(item)]
+            values=[item_id, self._timestamp(), self._encode(item)]
         )
 
         self._close()
@@ -197,16 +513,14 @@ class Database:
 
         self._open()
 
-        result = self._execute(
-            False,
-            'SELECT key FROM %s ORDER BY time DESC LIMIT -1 OFFSET %d' % \
-            (self.table_name, self.max_item_count)
+        self._execute(
+            True,
+            'DELETE FROM %s WHERE key IN '
+            '(SELECT key FROM %s ORDER BY time DESC LIMIT -1 OFFSET ?)' %
+            (self.table_name, self.table_name),
+            [self.max_item_count]
         )
 
-        if result is not None:
-            for item in result:
-                self._remove(item[0])
-
         self._close()
 
     def _clear(self):
@@ -214,9 +528,12 @@ class Database:
         self._execute(True, 'DELETE FROM %s' % self.table_name)
         self._create_table()
         self._close()
-        self._open()
-        self._execute(False, 'VACUUM')
-        self._close()
+
+        # VACUUM can't run inside a transaction, leave it to the next clear
+        if not self.needs_commit:
+            self._open()
+            self._execute(False, 'VACUUM')
+            self._close()
 
     def _is_empty(self):
         self._open()
@@ -268,12 +585,161 @@ class Database:
             return None
 
         self._close()
-        return pickle.loads(item[1]), item[0]
+        return self._decode(item[1]), item[0]
 
     def _remove(self, item_id):
         self._open()
         self._execute(True, 'DELETE FROM %s WHERE key = ?' % self.table_name, [item_id])
+        self._close()
+
+    def _get_many(self, item_ids, oldest=None, decode=True):
+        """
+        Read multiple items, one query per `MAX_VARIABLES` ids
+
+        :param item_ids: keys of the items to read
+        :type item_ids: list
+        :param oldest: only return items written at or after this time, see `_timestamp`
+        :type oldest: int | datetime.datetime | None
+        :param decode: decode the items, otherwise the stored values are returned
+        :type decode: bool
+        :return: {key: (item, time), ...} for every key found
+        :rtype: dict
+        """
+        payload = {}
+
+        item_ids = list(item_ids)
+        if not item_ids:
+            return payload
+
+        self._open()
+
+        query = 'SELECT key, time, value FROM %s WHERE key IN (%s)'
+        if oldest is not None:
+            query += ' AND time >= ?'
+
+        for chunk in chunks(item_ids, MAX_VARIABLES):
+            values = chunk if oldest is None else chunk + [oldest]
+            result = self._execute(
+                False,
+                query % (self.table_name, ','.join(['?' for _ in chunk])),
+                values
+            )
+
+            if result is None:
+                continue
+
+            for key, timestamp, value in result:
+                payload[key] = (self._decode(value) if decode else value, timestamp)
+
+        self._close()
+        return payload
+
+    def _set_many(self, items):
+        """
+        Write multiple items in a single transaction
+
+        :param items: (key, item) pairs or {key: item, ...}
+        :type items: list | dict
+        """
+        if isinstance(items, dict):
+            items = items.items()
+
+        if self.max_file_size_kb < 1 and self.max_item_count < 1:
+            self._optimize_item_count()
+            self._optimize_file_size()
+            return
+
+        timestamp = self._timestamp()
+        rows = [(key, timestamp, self._encode(item)) for key, item in items]
+        if not rows:
+            return
+
+        with self._transaction():
+            self._execute_many(
+                'REPLACE INTO %s (key,time,value) VALUES(?,?,?)' % self.table_name, rows
+            )
+
+        self._optimize_item_count()
+        self._optimize_file_size()
+
+    def _remove_many(self, item_ids):
+        item_ids = list(item_ids)
+        if not item_ids:
+            return
+
+        with self._transaction():
+            for chunk in chunks(item_ids, MAX_VARIABLES):
+                self._execute(
+                    True,
+                    'DELETE FROM %s WHERE key IN (%s)' %
+                    (self.table_name, ','.join(['?' for _ in chunk])),
+                    chunk
+                )
+
+    def _iterate(self, offset=0, limit=-1, order='time DESC'):
+        """
+        Stream items in the requested order without loading the whole table
+
+        :param offset: number of items to skip
+        :type offset: int
+        :param limit: maximum number of items, -1 for no limit
+        :type limit: int
+        :param order: column and direction to order by, ie. 'time DESC' or 'value ASC'
+        :type order: str
+        :return: generator of (key, item, time)
+        :rtype: generator
+        """
+        column, _, direction = order.partition(' ')
+        direction = direction.strip().upper() or 'ASC'
+        if column not in ['key', 'time', 'value'] or direction not in ['ASC', 'DESC']:
+            raise ValueError('Invalid order: %s' % order)
+
+        self._open()
+
+        try:
+            result = self._execute(
+                False,
+                'SELECT key, time, value FROM %s ORDER BY %s %s LIMIT ? OFFSET ?' %
+                (self.table_name, column, direction),
+                [int(limit), int(offset)]
+            )
+
+            if result is None:
+                return
+
+            for key, timestamp, value in result:
+                yield key, self._decode(value), timestamp
+
+        finally:
+            self._close()
 
     @staticmethod
     def _encode(obj):
         return sqlite3.Binary(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def _decode(obj):
+        return pickle.loads(obj)
+
+
+class Transaction:
+    """
+    Explicit transaction scope for a Database, committed on exit or rolled back on error
+
+        with self._transaction():
+            self._execute(True, ...)
+    """
+
+    def __init__(self, database):
+        self._database = database
+
+    def __enter__(self):
+        self._database._open()
+        return self._database
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self._database._rollback()
+
+        self._database._close()
+        return False
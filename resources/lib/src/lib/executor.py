@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .logger import Log
+
+LOG = Log('lib', __file__)
+
+# maximum number of branches in flight at once
+MAX_WORKERS = 10
+
+
+class Task:
+    def __init__(self, name, future, func, args, kwargs):
+        self.name = name
+        self.future = future
+
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+
+class Executor:
+    """
+    Scatter-gather executor for independent, network bound lookups
+
+        videos = executor.submit('videos', get_cached, context, ...)
+        mine = executor.submit('channel mine', context.api.channel_by_username, 'mine')
+        cached_videos, channel_mine = executor.gather(videos, mine)
+
+    Branches that haven't started when they are gathered run on the gathering thread, so
+    branches may submit and gather their own branches without exhausting the pool.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._max_workers = max_workers
+
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def max_workers(self):
+        return int(self._max_workers)
+
+    def submit(self, name, func, *args, **kwargs):
+        """
+        Start a branch
+
+        :param name: name of the branch used when logging its timing
+        :type name: str
+        :param func: callable to run
+        :return: task to pass to `gather`
+        :rtype: Task
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+            future = self._executor.submit(_run, name, func, args, kwargs)
+
+        return Task(name, future, func, args, kwargs)
+
+    def gather(self, *tasks):
+        """
+        Wait for the branches, exceptions raised by a branch are raised here
+
+        :return: results in the order of the provided tasks
+        :rtype: list
+        """
+        payload = []
+
+        for task in tasks:
+            if task.future.cancel():
+                payload.append(_run(task.name, task.func, task.args, task.kwargs))
+                continue
+
+            payload.append(task.future.result())
+
+        return payload
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+def _run(name, func, args, kwargs):
+    start = time.time()
+
+    try:
+        return func(*args, **kwargs)
+    finally:
+        LOG.debug('Executor: %s finished in %.1f ms on %s' %
+                  (name, (time.time() - start) * 1000, threading.current_thread().name))
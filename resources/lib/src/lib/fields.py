@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+# fields describing the response rather than the requested resources,
+# kept by `project` whatever the mask
+RESPONSE_FIELDS = ['kind', 'etag', 'nextPageToken', 'prevPageToken', 'pageInfo']
+
+
+def parse(mask):
+    """
+    Parse a fields mask ie. 'items(id,snippet(title,thumbnails/default)),nextPageToken'
+    into a tree of selected fields, {} selects a field with all of its subfields
+
+    :param mask: fields mask, empty for the complete response
+    :type mask: str
+    :return: tree of selected fields, None for the complete response
+    :rtype: dict | None
+    """
+    if not mask:
+        return None
+
+    tree, position = _parse(mask, 0)
+    if position != len(mask):
+        raise ValueError('Unbalanced parentheses in fields mask: %s' % mask)
+
+    if '*' in tree:
+        return None
+
+    return tree
+
+
+def covers(broad, narrow):
+    """
+    :param broad: tree of a fields mask a response was requested with
+    :type broad: dict | None
+    :param narrow: tree of the fields mask requested
+    :type narrow: dict | None
+    :return: whether a response to the broad mask has every field the narrow mask selects
+    :rtype: bool
+    """
+    if broad is None:
+        return True
+
+    if narrow is None:
+        return False
+
+    for field, subfields in narrow.items():
+        if field not in broad:
+            return False
+
+        if not broad[field]:
+            continue
+
+        if not subfields or not covers(broad[field], subfields):
+            return False
+
+    return True
+
+
+def project(payload, tree, keep=None):
+    """
+    Reduce a response to the fields selected by a fields mask tree
+
+    :param payload: api response
+    :type payload: dict
+    :param tree: tree of selected fields, see `parse`
+    :type tree: dict | None
+    :param keep: top level fields kept regardless of the tree, defaults to RESPONSE_FIELDS
+    :type keep: list
+    :return: projected response
+    :rtype: dict
+    """
+    if tree is None or not isinstance(payload, dict):
+        return payload
+
+    if keep is None:
+        keep = RESPONSE_FIELDS
+
+    tree = dict(tree)
+    for field in keep:
+        tree.setdefault(field, {})
+
+    return _project(payload, tree)
+
+
+def _project(value, tree):
+    if not tree:
+        return value
+
+    if isinstance(value, list):
+        return [_project(item, tree) for item in value]
+
+    if not isinstance(value, dict):
+        return value
+
+    payload = {}
+    for field, subfields in tree.items():
+        if field in value:
+            payload[field] = _project(value[field], subfields)
+
+    return payload
+
+
+def _merge(tree, field, subfields):
+    if field in tree and (not tree[field] or not subfields):
+        tree[field] = {}
+        return
+
+    existing = tree.setdefault(field, {})
+    for name, children in subfields.items():
+        _merge(existing, name, children)
+
+
+def _parse(mask, position):
+    tree = {}
+    path = ['']
+
+    def add(subfields):
+        field = path[-1].strip()
+        if not field:
+            return
+
+        for parent in reversed(path[:-1]):
+            subfields = {field: subfields}
+            field = parent.strip()
+
+        _merge(tree, field, subfields)
+
+    while position < len(mask):
+        character = mask[position]
+
+        if character == '(':
+            subfields, position = _parse(mask, position + 1)
+            if position >= len(mask) or mask[position] != ')':
+                raise ValueError('Unbalanced parentheses in fields mask: %s' % mask)
+
+            if '*' in subfields:
+                subfields = {}
+
+            add(subfields)
+            path = ['']
+            position += 1
+            continue
+
+        if character == ')':
+            break
+
+        if character == ',':
+            add({})
+            path = ['']
+
+        elif character == '/':
+            path.append('')
+
+        else:
+            path[-1] += character
+
+        position += 1
+
+    add({})
+    return tree, position
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# a lock file created with the fallback is stale when its owner is gone or it is older
+STALE_AFTER = 60.0
+
+# waiting for a held lock starts polling at MIN_SLEEP, doubling up to MAX_SLEEP
+MIN_SLEEP = 0.001
+MAX_SLEEP = 0.05
+
+
+class FileLock:
+    """
+    Cross-process lock on a lock file
+
+    The lock is an advisory lock held by the operating system (flock on posix, msvcrt
+    byte range locks on windows), it is released when the owning process exits, so there
+    are no stale locks. Where neither is available the lock file is created exclusively
+    and holds the owner's pid and the time it was taken, lock files of owners that are
+    gone or that are older than STALE_AFTER are taken over.
+
+    Threads of the same process exclude each other like other processes do, also when they
+    share an instance. The lock is owned by the thread that acquired it, acquiring it again
+    from that thread succeeds immediately and only the owner releases it.
+
+        lock = FileLock('/path/to/users.lock')
+        if lock.acquire(timeout=60):
+            try:
+                ...
+            finally:
+                lock.release()
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+        self._descriptor = None
+        self._owner = None
+
+        # held by the owning thread from acquire to release, other threads wait for it
+        self._lock = threading.Lock()
+
+    @property
+    def locked(self):
+        """
+        :return: whether the calling thread holds the lock through this instance
+        :rtype: bool
+        """
+        return self._owner == threading.get_ident()
+
+    def acquire(self, timeout=60.0, abort=None):
+        """
+        :param timeout: seconds to wait for the lock
+        :type timeout: float
+        :param abort: callable returning True when waiting should be given up, ie. on shutdown
+        :return: whether the lock was acquired
+        :rtype: bool
+        """
+        if self.locked:
+            return True
+
+        deadline = time.time() + timeout
+        sleep_time = MIN_SLEEP
+
+        # held until release, see _lock
+        while not self._lock.acquire(timeout=sleep_time):  # pylint: disable=consider-using-with
+            if time.time() > deadline or (abort is not None and abort()):
+                return False
+
+            sleep_time = min(sleep_time * 2, MAX_SLEEP)
+
+        sleep_time = MIN_SLEEP
+        descriptor = None
+
+        try:
+            while True:
+                descriptor = self._try_acquire()
+                if descriptor is not None:
+                    break
+
+                if time.time() + sleep_time > deadline or (abort is not None and abort()):
+                    return False
+
+                time.sleep(sleep_time)
+                sleep_time = min(sleep_time * 2, MAX_SLEEP)
+
+        finally:
+            if descriptor is None:
+                self._lock.release()
+
+        self._descriptor = descriptor
+        self._owner = threading.get_ident()
+        return True
+
+    def release(self):
+        if not self.locked:
+            return
+
+        descriptor = self._descriptor
+        self._descriptor = None
+        self._owner = None
+
+        try:
+            if fcntl is not None:
+                fcntl.flock(descriptor, fcntl.LOCK_UN)
+                os.close(descriptor)
+
+            elif msvcrt is not None:
+                os.lseek(descriptor, 0, os.SEEK_SET)
+                msvcrt.locking(descriptor, msvcrt.LK_UNLCK, 1)
+                os.close(descriptor)
+
+            else:
+                os.close(descriptor)
+                try:
+                    os.remove(self.filename)
+                except OSError:
+                    pass
+
+        finally:
+            self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+    def _try_acquire(self):
+        if fcntl is not None:
+            return self._try_flock()
+
+        if msvcrt is not None:
+            return self._try_msvcrt()
+
+        return self._try_exclusive()
+
+    def _try_flock(self):
+        descriptor = os.open(self.filename, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(descriptor)
+            return None
+
+        return descriptor
+
+    def _try_msvcrt(self):
+        descriptor = os.open(self.filename, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            msvcrt.locking(descriptor, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(descriptor)
+            return None
+
+        return descriptor
+
+    def _try_exclusive(self):
+        try:
+            descriptor = os.open(self.filename, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            if self._stale():
+                try:
+                    os.remove(self.filename)
+                except OSError:
+                    pass
+
+            return None
+
+        os.write(descriptor, ('%d %f' % (os.getpid(), time.time())).encode('utf-8'))
+        return descriptor
+
+    def _stale(self):
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as file_handle:
+                owner = file_handle.read().split()
+
+            modified = os.path.getmtime(self.filename)
+
+        except (IOError, OSError):
+            return False
+
+        try:
+            pid, timestamp = int(owner[0]), float(owner[1])
+        except (IndexError, ValueError):
+            # written by an older version, only its age tells
+            return modified < time.time() - STALE_AFTER
+
+        if timestamp < time.time() - STALE_AFTER:
+            return True
+
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            pass
+
+        return False
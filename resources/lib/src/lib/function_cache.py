@@ -0,0 +1,444 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+import os
+import sqlite3
+import time
+
+from .database import Database
+
+
+class FunctionCache(Database):
+    """
+    Single file store for memoized function results
+
+    Rows are keyed on the memoizer's canonical key and carry the time they were written,
+    when they expire and when they were last read. Expired rows are purged and the least
+    recently used rows are evicted once the store grows past `max_item_count`.
+
+    Rows may be labelled with invalidation tags, see `invalidate`.
+
+    Results may carry the etag of the response they were created from, so expired results
+    can be revalidated instead of replaced, see `etag` and `extend`.
+
+    Results of calls with a fields mask carry the key of the call without its mask and the
+    mask, so narrower requests can be answered from broader results, see `get_masks`.
+
+    Short-lived locks keyed on the same keys let concurrent invocations coalesce identical
+    requests, see `lock` and `unlock`.
+
+    Reads are recorded in `accessed` in batches like `Cache` does, pending reads are written
+    before rows are written or evicted.
+    """
+
+    _schema_version = 2
+
+    # pending reads are written once there are this many, or when the store is written/released
+    _access_batch_size = 250
+
+    def __init__(self, filename, max_item_count=5000):
+        super().__init__(filename, max_item_count=max_item_count)
+
+        self._accessed = {}
+
+    def __del__(self):
+        try:
+            self._flush_access()
+        except:  # pylint: disable=bare-except
+            pass
+
+        super().__del__()
+
+    def get(self, key, limit):
+        self._open()
+
+        now = time.time()
+
+        result = self._execute(
+            False,
+            'SELECT value, time FROM %s WHERE key=? AND time>=?' % self.table_name,
+            [key, now - limit]
+        )
+
+        item = result.fetchone() if result is not None else None
+
+        self._close()
+
+        if item is None:
+            return None
+
+        self._touch(key, now)
+        return self._decode(item[0]), item[1]
+
+    def set(self, key, limit, item, tags=None, etag=None, base=None, mask=None):
+        self._write([(key, self._encode(item))], limit, tags, etag, base, mask)
+
+    def get_masks(self, base, limit):
+        """
+        :param base: key of the call without its fields mask
+        :type base: str
+        :param limit: seconds a result remains valid for
+        :type limit: int
+        :return: (key, fields mask) of the valid results of the call, newest first
+        :rtype: list
+        """
+        self._open()
+
+        result = self._execute(
+            False,
+            'SELECT key, mask FROM %s WHERE base=? AND time>=? ORDER BY time DESC' %
+            self.table_name,
+            [base, time.time() - limit]
+        )
+        items = result.fetchall() if result is not None else []
+
+        self._close()
+
+        return items
+
+    def etag(self, key):
+        """
+        :param key: canonical key of the result
+        :type key: str
+        :return: etag of the stored result, expired or not, '' if there is none
+        :rtype: str
+        """
+        self._open()
+
+        result = self._execute(False, 'SELECT etag FROM %s WHERE key=?' % self.table_name, [key])
+        item = result.fetchone() if result is not None else None
+
+        self._close()
+
+        if item is None:
+            return ''
+
+        return item[0] or ''
+
+    def extend(self, key, limit):
+        """
+        Mark a stored result as just written, ie. after the api reported it unchanged
+
+        :param key: canonical key of the result
+        :type key: str
+        :param limit: seconds until the result is purged
+        :type limit: int
+        :return: the result and the time it was written, None if it no longer exists
+        :rtype: tuple | None
+        """
+        now = time.time()
+
+        with self._transaction():
+            result = self._execute(
+                True,
+                'UPDATE %s SET time=?, expires=?, accessed=? WHERE key=?' % self.table_name,
+                [now, now + limit, now, key]
+            )
+
+        if result is None or result.rowcount != 1:
+            return None
+
+        return self.get(key, limit)
+
+    def count_revalidation(self, name, not_modified):
+        with self._transaction():
+            self._execute(
+                True,
+                'INSERT OR IGNORE INTO %s_revalidations (name,requests,not_modified) '
+                'VALUES(?,0,0)' % self.table_name,
+                [name]
+            )
+            self._execute(
+                True,
+                'UPDATE %s_revalidations SET requests=requests+1, '
+                'not_modified=not_modified+? WHERE name=?' % self.table_name,
+                [int(bool(not_modified)), name]
+            )
+
+    def revalidations(self):
+        self._open()
+
+        result = self._execute(
+            False,
+            'SELECT name, requests, not_modified FROM %s_revalidations' % self.table_name
+        )
+        items = result.fetchall() if result is not None else []
+
+        self._close()
+
+        return dict((name, {'requests': requests, 'not_modified': not_modified})
+                    for name, requests, not_modified in items)
+
+    def invalidate(self, tags):
+        """
+        Remove every row labelled with any of the provided tags
+
+        :param tags: invalidation tags ie. ['subscriptions:mine', 'playlist:PL...']
+        :type tags: list
+        """
+        if not tags:
+            return
+
+        tags = list(tags)
+        placeholders = ','.join(['?' for _ in tags])
+
+        self._open()
+
+        self._execute(
+            True,
+            'DELETE FROM %s WHERE key IN (SELECT key FROM %s_tags WHERE tag IN (%s))' %
+            (self.table_name, self.table_name, placeholders),
+            tags
+        )
+        self._execute(
+            True,
+            'DELETE FROM %s_tags WHERE tag IN (%s)' % (self.table_name, placeholders),
+            tags
+        )
+
+        self._close()
+
+    def lock(self, key, owner, timeout):
+        """
+        Take the lock on a key unless another owner holds it, locks expire after the timeout
+        so an invocation that died while holding one doesn't block the key
+
+        :param key: canonical key of the request
+        :type key: str
+        :param owner: unique id of the caller taking the lock
+        :type owner: str
+        :param timeout: seconds the lock is held for at most
+        :type timeout: float
+        :return: whether the lock was taken
+        :rtype: bool
+        """
+        now = time.time()
+
+        with self._transaction():
+            self._execute(
+                True,
+                'DELETE FROM %s_locks WHERE key=? AND expires<?' % self.table_name,
+                [key, now]
+            )
+            result = self._execute(
+                True,
+                'INSERT OR IGNORE INTO %s_locks (key,owner,expires) VALUES(?,?,?)' %
+                self.table_name,
+                [key, owner, now + timeout]
+            )
+
+        return result is not None and result.rowcount == 1
+
+    def unlock(self, key, owner):
+        self._open()
+        self._execute(
+            True,
+            'DELETE FROM %s_locks WHERE key=? AND owner=?' % self.table_name,
+            [key, owner]
+        )
+        self._close()
+
+    def locked(self, key):
+        self._open()
+
+        result = self._execute(
+            False,
+            'SELECT 1 FROM %s_locks WHERE key=? AND expires>=?' % self.table_name,
+            [key, time.time()]
+        )
+        item = result.fetchone() if result is not None else None
+
+        self._close()
+
+        return item is not None
+
+    def migrate(self, path, limit):
+        """
+        Import a directory of legacy pickle files, one file per key, keeping their mtime
+
+        :param path: directory containing the legacy cache files
+        :type path: str
+        :param limit: seconds the imported results remain valid for after their mtime
+        :type limit: int
+        :return: number of imported results
+        :rtype: int
+        """
+        rows = []
+        for filename in os.listdir(path):
+            full_path = os.path.join(path, filename)
+            try:
+                with open(full_path, 'rb') as file_handle:
+                    payload = file_handle.read()
+
+                rows.append((filename, sqlite3.Binary(payload), os.path.getmtime(full_path)))
+
+            except (IOError, OSError):
+                continue
+
+        if not rows:
+            return 0
+
+        self._open()
+
+        query = 'INSERT OR IGNORE INTO %s (key,time,expires,accessed,value) ' \
+                'VALUES(?,?,?,?,?)' % self.table_name
+
+        self._execute_many(
+            query, [(key, mtime, mtime + limit, mtime, payload) for key, payload, mtime in rows]
+        )
+
+        self._close()
+
+        return len(rows)
+
+    def clear(self):
+        self._accessed = {}
+
+        self._open()
+        self._execute(True, 'DELETE FROM %s_tags' % self.table_name)
+        self._close()
+
+        self._clear()
+
+    def delete(self):
+        """
+        Empty the store in place, see Database._delete
+
+        :return: whether the store was emptied
+        :rtype: bool
+        """
+        self._accessed = {}
+        return self._delete()
+
+    def _touch(self, key, timestamp):
+        self._accessed[key] = timestamp
+
+        if len(self._accessed) >= self._access_batch_size:
+            self._flush_access()
+
+    def _flush_access(self):
+        if not self._accessed:
+            return
+
+        accessed = self._accessed
+        self._accessed = {}
+
+        with self._transaction():
+            self._execute_many(
+                'UPDATE %s SET accessed=? WHERE key=?' % self.table_name,
+                [(timestamp, key) for key, timestamp in accessed.items()]
+            )
+
+    def _write(self, items, limit, tags=None, etag=None, base=None, mask=None):
+        now = time.time()
+        query = 'REPLACE INTO %s (key,time,expires,accessed,value,etag,base,mask) ' \
+                'VALUES(?,?,?,?,?,?,?,?)' % self.table_name
+        tag_query = 'INSERT OR IGNORE INTO %s_tags (tag,key) VALUES(?,?)' % self.table_name
+
+        self._flush_access()
+
+        with self._transaction():
+            self._execute_many(
+                query, [(key, now, now + limit, now, payload, etag, base, mask)
+                        for key, payload in items]
+            )
+
+            if tags:
+                self._execute_many(tag_query, [(tag, key) for key, _ in items for tag in tags])
+
+        self._optimize_item_count()
+
+    def _create_table(self):
+        if not self.table_created:
+            self._execute(
+                True,
+                'CREATE TABLE IF NOT EXISTS %s (key TEXT PRIMARY KEY, time REAL, '
+                'expires REAL, accessed REAL, value BLOB)' % self.table_name
+            )
+            self._execute(
+                True,
+                'CREATE INDEX IF NOT EXISTS %s_expires ON %s (expires)' %
+                (self.table_name, self.table_name)
+            )
+            self._execute(
+                True,
+                'CREATE INDEX IF NOT EXISTS %s_accessed ON %s (accessed)' %
+                (self.table_name, self.table_name)
+            )
+            self._execute(
+                True,
+                'CREATE TABLE IF NOT EXISTS %s_tags (tag TEXT, key TEXT, '
+                'PRIMARY KEY (tag, key))' % self.table_name
+            )
+            self._execute(
+                True,
+                'CREATE INDEX IF NOT EXISTS %s_tags_key ON %s_tags (key)' %
+                (self.table_name, self.table_name)
+            )
+            self._execute(
+                True,
+                'CREATE TABLE IF NOT EXISTS %s_locks (key TEXT PRIMARY KEY, owner TEXT, '
+                'expires REAL)' % self.table_name
+            )
+            self._execute(
+                True,
+                'CREATE TABLE IF NOT EXISTS %s_revalidations (name TEXT PRIMARY KEY, '
+                'requests INTEGER, not_modified INTEGER)' % self.table_name
+            )
+            self._migrate()
+            self._execute(
+                True,
+                'CREATE INDEX IF NOT EXISTS %s_base ON %s (base)' %
+                (self.table_name, self.table_name)
+            )
+            self.table_created = True
+
+    def _upgrade(self, version):
+        if version < 1:
+            self._execute(True, 'ALTER TABLE %s ADD COLUMN etag TEXT' % self.table_name)
+
+        if version < 2:
+            self._execute(True, 'ALTER TABLE %s ADD COLUMN base TEXT' % self.table_name)
+            self._execute(True, 'ALTER TABLE %s ADD COLUMN mask TEXT' % self.table_name)
+
+    def _optimize_item_count(self):
+        self._open()
+
+        removed = 0
+
+        result = self._execute(
+            True,
+            'DELETE FROM %s WHERE expires<?' % self.table_name,
+            [time.time()]
+        )
+        if result is not None:
+            removed += max(result.rowcount, 0)
+
+        if self.max_item_count > 0:
+            result = self._execute(
+                True,
+                'DELETE FROM %s WHERE key IN '
+                '(SELECT key FROM %s ORDER BY accessed DESC LIMIT -1 OFFSET %d)' %
+                (self.table_name, self.table_name, self.max_item_count)
+            )
+            if result is not None:
+                removed += max(result.rowcount, 0)
+
+        if removed:
+            self._execute(
+                True,
+                'DELETE FROM %s_tags WHERE key NOT IN (SELECT key FROM %s)' %
+                (self.table_name, self.table_name)
+            )
+
+        self._close()
+
+    def _optimize_file_size(self):
+        pass
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+import builtins
+import sys
+import threading
+import time
+from importlib.util import resolve_name
+
+import xbmcaddon  # pylint: disable=import-error
+
+from .logger import Log
+
+LOG = Log('lib', __file__)
+
+# milliseconds each route may spend importing modules, by entrypoint and mode.
+# routes that never reach the api shouldn't need to import its client
+DEFAULT_BUDGET = 500
+BUDGETS = {
+    ('plugin', 'settings'): 100,
+    ('script', 'main'): 100,
+    ('script', 'refresh'): 100,
+    ('script', 'hide_menu'): 100,
+    ('script', 'cache'): 150,
+    ('script', 'configure_regional'): 150,
+    ('script', 'configure_subtitles'): 150,
+}
+
+# number of modules listed in the report, slowest first
+REPORT_LIMIT = 30
+
+PROFILE = None
+
+
+class ImportProfile:
+    """
+    Times every module imported while it is running, similar to `python -X importtime`.
+    Cumulative time includes the modules imported by a module, self time doesn't.
+    """
+
+    def __init__(self):
+        # (depth, module, cumulative seconds, self seconds) in the order imports finished
+        self.records = []
+
+        self._import = None
+        self._local = threading.local()
+        self._records_lock = threading.Lock()
+
+    @property
+    def total(self):
+        """
+        :return: seconds spent importing modules
+        :rtype: float
+        """
+        return sum(record[2] for record in self.records if record[0] == 0)
+
+    def start(self):
+        self._import = builtins.__import__
+        builtins.__import__ = self._profiled_import
+
+    def stop(self):
+        if self._import is not None:
+            builtins.__import__ = self._import
+            self._import = None
+
+    def report(self, limit=REPORT_LIMIT):
+        """
+        :param limit: number of modules listed
+        :type limit: int
+        :return: the slowest modules, one line each
+        :rtype: str
+        """
+        records = sorted(self.records, key=lambda record: record[2], reverse=True)
+
+        lines = ['%10s | %10s | module' % ('self [ms]', 'cumulative')]
+        for depth, module, cumulative, own in records[:limit]:
+            lines.append('%10.1f | %10.1f | %s%s' %
+                         (own * 1000, cumulative * 1000, '  ' * depth, module))
+
+        return '\n'.join(lines)
+
+    def _profiled_import(self, name, globals=None, locals=None,  # pylint: disable=redefined-builtin
+                         fromlist=(), level=0):
+        modules = self._loading(name, globals, fromlist, level)
+        if not modules:
+            return self._import(name, globals, locals, fromlist, level)
+
+        stack = self._stack()
+        # time spent importing the modules imported by these ones
+        stack.append(0.0)
+
+        started = time.perf_counter()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+
+        finally:
+            cumulative = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += cumulative
+
+            with self._records_lock:
+                self.records.append((len(stack), ', '.join(modules),
+                                     cumulative, cumulative - children))
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @staticmethod
+    def _loading(name, globals, fromlist, level):  # pylint: disable=redefined-builtin
+        """
+        :return: names of the modules the import is going to load, empty when all are loaded
+        :rtype: list
+        """
+        module = name
+        if level:
+            try:
+                module = resolve_name('.' * level + name, (globals or {}).get('__package__'))
+            except (ImportError, ValueError):
+                return []
+
+        if module not in sys.modules:
+            return [module]
+
+        # from package import submodule
+        return ['%s.%s' % (module, item) for item in fromlist or ()
+                if item != '*' and '%s.%s' % (module, item) not in sys.modules]
+
+
+def enabled():
+    try:
+        return xbmcaddon.Addon().getSettingBool('debug.import.profile')
+    except:  # pylint: disable=bare-except
+        return False
+
+
+def start():
+    """
+    Start profiling imports if enabled in the settings, before anything else is imported
+    """
+    global PROFILE  # pylint: disable=global-statement
+
+    if PROFILE is None and enabled():
+        PROFILE = ImportProfile()
+        PROFILE.start()
+
+
+def finish(entrypoint, mode):
+    """
+    Stop profiling imports, log the slowest modules and whether the route kept its budget
+
+    :param entrypoint: 'plugin' or 'script'
+    :type entrypoint: str
+    :param mode: mode of the route invoked
+    :type mode: str
+    """
+    global PROFILE  # pylint: disable=global-statement
+
+    if PROFILE is None:
+        return
+
+    profile = PROFILE
+    PROFILE = None
+    profile.stop()
+
+    total = profile.total * 1000
+    budget = BUDGETS.get((entrypoint, str(mode)), DEFAULT_BUDGET)
+
+    LOG.debug('Import profile [%s:%s]: %d modules in %.1f ms\n%s' %
+              (entrypoint, mode, len(profile.records), total, profile.report()))
+
+    if total > budget:
+        LOG.warning('Import profile [%s:%s]: %.1f ms exceeds the budget of %d ms' %
+                    (entrypoint, mode, total, budget))
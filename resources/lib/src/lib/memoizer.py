@@ -10,16 +10,68 @@
 
 import functools
 import hashlib
+import inspect
+import itertools
 import os
-import pickle
+import queue
+import shutil
+import threading
 import time
+from string import Formatter
+from uuid import uuid4
 
+import xbmcgui  # pylint: disable=import-error
 import xbmcvfs  # pylint: disable=import-error
 
 from ..constants import ADDON_ID
+from ..constants import ONE_DAY
+from ..constants import ONE_WEEK
+from . import fields
+from .function_cache import FunctionCache
+from .memory_cache import MemoryCache
 
 ENABLED = True
-PATH = xbmcvfs.translatePath('special://temp/%s/cache/' % ADDON_ID)
+PATH = xbmcvfs.translatePath('special://temp/%s/' % ADDON_ID)
+FILENAME = os.path.join(PATH, 'function_cache.sqlite')
+
+# results used to be stored as one pickle file per call in this directory
+LEGACY_PATH = os.path.join(PATH, 'cache', '')
+
+# bumped by reset_cache() so every process drops its in-memory results
+GENERATION_PROPERTY = '%s-function-cache-generation' % ADDON_ID
+
+STORE = FunctionCache(FILENAME)
+MEMORY = MemoryCache(max_items=250)
+
+# identical requests made while another invocation is fetching wait for its result
+# instead of fetching it again, for at most LOCK_TIMEOUT seconds
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.1
+
+# every limit and grace period is multiplied by this, or by what it returns on each call
+# when callable, ie. while the api quota is low
+LIMIT_FACTOR = 1
+
+# whether memoized functions can make conditional requests, set by the api when the module
+# it requests from supports them, see API.__init__
+CONDITIONAL_REQUESTS = False
+
+# results with an etag are kept this long after they expire, so they can be revalidated
+# with a conditional request instead of being downloaded again
+ETAG_RETENTION = ONE_DAY
+
+# revalidation state of the memoized call running on each thread, see `revalidation`
+REVALIDATION = threading.local()
+
+# keys of expired results queued or being refreshed in the background
+REVALIDATING = set()
+REVALIDATING_LOCK = threading.Lock()
+
+# expired results are refreshed one at a time by a daemon worker, refreshes that don't fit
+# in the queue are dropped and the stale result is revalidated by a later call
+REVALIDATE_QUEUE_SIZE = 25
+REVALIDATE_QUEUE = queue.Queue(maxsize=REVALIDATE_QUEUE_SIZE)
+REVALIDATE_WORKER = None
 
 
 def make_path():
@@ -30,62 +82,283 @@ def make_path():
 
 
 def reset_cache():
-    xbmcvfs.rmdir(PATH, force=True)
+    STORE.clear()
+    _invalidate_memory()
+    return make_path()
+
+
+def cache_info():
+    return MEMORY.info()
+
+
+def revalidation_info():
+    """
+    :return: conditional requests made and how many of them were not modified (304), by name
+    :rtype: dict
+    """
+    try:
+        return STORE.revalidations()
+    except:  # pylint: disable=bare-except
+        return {}
+
+
+class Revalidation:
+    """
+    Revalidation state of a memoized call, the etag of its expired result if it has one
+    (otherwise '') and whether a conditional request was sent and answered with a 304
+    """
+
+    def __init__(self, etag=''):
+        self.etag = etag
+        self.sent = False
+        self.not_modified = False
+
+
+def revalidation():
+    """
+    :return: revalidation state of the memoized call running on this thread,
+             None if the thread isn't fetching a memoized result
+    :rtype: Revalidation | None
+    """
+    return getattr(REVALIDATION, 'state', None)
+
+
+def invalidate(*tags):
+    """
+    Remove cached results labelled with any of the provided tags, leaving the rest warm
+
+    :param tags: invalidation tags ie. 'subscriptions:mine', 'playlist:PL...', 'rating:<video_id>'
+    :type tags: str
+    """
+    tags = [tag for tag in tags if tag]
+    if not tags:
+        return
+
+    try:
+        STORE.invalidate(tags)
+    except:  # pylint: disable=bare-except
+        STORE.clear()
+
+    _invalidate_memory()
+
+
+def delete_cache():
+    _invalidate_memory()
+    STORE.delete()
+
     return make_path()
 
 
-def _get_filename(name, args, kwargs):
+def migrate_legacy_cache():
+    # the directory is removed once imported, after that this is a single stat on import
+    if not os.path.isdir(LEGACY_PATH):
+        return 0
+
+    try:
+        migrated = STORE.migrate(LEGACY_PATH, ONE_WEEK)
+    except (IOError, OSError):
+        migrated = 0
+
+    shutil.rmtree(LEGACY_PATH, ignore_errors=True)
+    return migrated
+
+
+def _invalidate_memory():
+    generation = str(uuid4().hex)
+    xbmcgui.Window(10000).setProperty(GENERATION_PROPERTY, generation)
+    MEMORY.validate(generation)
+
+
+def _get_key(name, args, kwargs):
     return hashlib.md5(name.encode('utf-8')).hexdigest() + \
            hashlib.md5(str(args).encode('utf-8')).hexdigest() + \
            hashlib.md5(str(kwargs).encode('utf-8')).hexdigest()
 
 
-def _load(name, args=None, kwargs=None, limit=60):
+def _format_tags(templates, signature, args, kwargs):
+    """
+    Fill tag templates ie. 'playlist:{playlist_id}' with the arguments of a call,
+    list arguments produce one tag per element and empty arguments produce no tag
+    """
+    if not templates:
+        return []
+
+    try:
+        bound = signature.bind(*args, **kwargs)
+    except TypeError:
+        return []
+
+    bound.apply_defaults()
+
+    payload = []
+    for template in templates:
+        names = [field for _, field, _, _ in Formatter().parse(template) if field]
+
+        values = []
+        for name in names:
+            value = bound.arguments.get(name)
+            values.append(value if isinstance(value, (list, tuple)) else [value])
+
+        if any(value in (None, '') for value in itertools.chain(*values)):
+            continue
+
+        for combination in itertools.product(*values):
+            payload.append(template.format(**dict(zip(names, combination))))
+
+    return payload
+
+
+def _get_view(name, signature, args, skip, kwargs, mask):
+    """
+    Split a call with a fields mask argument into the call without its mask and the mask
+
+    :param skip: number of leading arguments left out of the key, ie. self
+    :type skip: int
+    :param mask: name of the argument holding the fields mask
+    :type mask: str
+    :return: (key of the call without its mask, the mask, the parsed mask),
+             None if the call has no valid mask argument
+    :rtype: tuple | None
+    """
+    if not mask:
+        return None
+
+    try:
+        bound = signature.bind(*args, **kwargs)
+    except TypeError:
+        return None
+
+    bound.apply_defaults()
+
+    arguments = list(bound.arguments.items())[skip:]
+    value = dict(arguments).get(mask) or ''
+
+    try:
+        tree = fields.parse(value)
+    except ValueError:
+        return None
+
+    base = _get_key(name, [], [argument for argument in arguments if argument[0] != mask])
+    return base, value, tree
+
+
+def _load_covering(view, limit):
+    """
+    Find a result requested with the same arguments and a fields mask covering the
+    requested mask, projected to the requested mask
+
+    :return: the projected result and the time it was cached, None if there is none
+    :rtype: tuple | None
+    """
+    base, _, tree = view
+
+    try:
+        candidates = STORE.get_masks(base, limit)
+    except:  # pylint: disable=bare-except
+        return None
+
+    for key, mask in candidates:
+        try:
+            covered = fields.covers(fields.parse(mask), tree)
+        except ValueError:
+            covered = False
+
+        if not covered:
+            continue
+
+        try:
+            result = STORE.get(key, limit)
+        except:  # pylint: disable=bare-except
+            result = None
+
+        # an error doesn't answer anything else
+        if result is not None and not (isinstance(result[0], dict) and 'error' in result[0]):
+            return fields.project(result[0], tree), result[1]
+
+    return None
+
+
+def _load(name, args=None, kwargs=None, limit=60, grace=0, view=None):
+    """
+    :param view: see `_get_view`, results of broader fields masks answer narrower ones
+    :return: whether a result was cached, the cached result and whether it has expired
+             but is still within the grace period
+    :rtype: tuple
+    """
     if not ENABLED or limit <= 0:
-        return False, None
+        return False, None, False
 
     if args is None:
         args = []
     if kwargs is None:
         kwargs = {}
 
-    now = time.time()
-    max_age = now - limit
+    key = _get_key(name, args, kwargs)
 
-    filename = os.path.join(PATH, _get_filename(name, args, kwargs))
-    if xbmcvfs.exists(filename):
-        mtime = xbmcvfs.Stat(filename).st_mtime()
+    MEMORY.validate(xbmcgui.Window(10000).getProperty(GENERATION_PROPERTY))
+    result = MEMORY.get(key, limit + grace)
 
-        if mtime >= max_age:
-            with open(filename, 'rb') as file_handle:
-                payload = file_handle.read()
+    if result is None:
+        try:
+            result = STORE.get(key, limit + grace)
+        except:  # pylint: disable=bare-except
+            result = None
 
-            return True, pickle.loads(payload)
+        if result is None and view is not None:
+            result = _load_covering(view, limit + grace)
 
-    return False, None
+        if result is None:
+            return False, None, False
+
+        MEMORY.set(key, *result)
+
+    payload, timestamp = result
+    return True, payload, timestamp < time.time() - limit
 
 
-def _save(name, args=None, kwargs=None, result=None):
+def _save(name, args=None, kwargs=None, result=None, limit=60, tags=None, view=None):
     if args is None:
         args = []
     if kwargs is None:
         kwargs = {}
 
-    try:
-        payload = pickle.dumps(result)
+    key = _get_key(name, args, kwargs)
+    MEMORY.set(key, result)
+
+    etag = result.get('etag') if isinstance(result, dict) else None
+    if etag and CONDITIONAL_REQUESTS:
+        limit += ETAG_RETENTION
 
-        filename = os.path.join(PATH, _get_filename(name, args, kwargs))
-        with open(filename, 'wb') as file_handle:
-            file_handle.write(payload)
+    base, mask = (view[0], view[1]) if view is not None else (None, None)
 
+    try:
+        STORE.set(key, limit, result, tags, etag, base, mask)
         return True
 
     except:  # pylint: disable=bare-except
         return False
 
 
-def cache_method(limit):
+def cache_method(limit, tags=None, grace=0, mask=None):
+    """
+    Memoize a method
+
+    :param limit: seconds a result remains valid for, or a callable returning them,
+                  called on each call so settings aren't read on import
+    :type limit: int | callable
+    :param tags: invalidation tag templates filled with the call's arguments,
+                 ie. ['playlist:{playlist_id}'], see `invalidate` and `invalidates`
+    :type tags: list
+    :param grace: seconds an expired result is still returned for (stale-while-revalidate),
+                  while it is refreshed in the background, or a callable returning them
+    :type grace: int | callable
+    :param mask: name of the argument holding a fields mask, results requested with a broader
+                 mask or without one answer calls with a narrower mask
+    :type mask: str
+    """
+
     def wrap(func):
+        signature = inspect.signature(func)
 
         @functools.wraps(func)
         def memoizer(*args, **kwargs):
@@ -96,41 +369,276 @@ def cache_method(limit):
                 name = func.__name__
                 rargs = args
 
-            cached, payload = _load(name, rargs, kwargs, limit=limit)
-            if cached:
-                return payload
-
-            payload = func(*args, **kwargs)
-            if ENABLED and limit > 0:
-                _save(name, rargs, kwargs, payload)
-
-            return payload
+            return _call(func, name, signature, args, rargs, kwargs, limit, tags, grace, mask)
 
         return memoizer
 
     return wrap
 
 
-def cache_function(limit):
+def cache_function(limit, tags=None, grace=0, mask=None):
     def wrap(func):
+        signature = inspect.signature(func)
 
         @functools.wraps(func)
         def memoizer(*args, **kwargs):
-            name = func.__name__
+            return _call(func, func.__name__, signature, args, args, kwargs,
+                         limit, tags, grace, mask)
 
-            cached, payload = _load(name, args, kwargs, limit=limit)
-            if cached:
-                return payload
+        return memoizer
+
+    return wrap
+
+
+def _call(func, name, signature, args, rargs, kwargs, limit, tags, grace, mask):  # pylint: disable=too-many-arguments
+    if callable(limit):
+        limit = limit()
+
+    if callable(grace):
+        grace = grace()
+
+    factor = LIMIT_FACTOR
+    if callable(factor):
+        # replaced by a callable at runtime, see API.__init__
+        factor = factor()
+    limit *= factor
+    grace *= factor
+
+    view = None
+    if ENABLED and limit > 0:
+        view = _get_view(name, signature, args, len(args) - len(rargs), kwargs, mask)
+
+    cached, payload, stale = _load(name, rargs, kwargs, limit=limit, grace=grace, view=view)
+    if cached:
+        if stale:
+            _revalidate(func, name, signature, args, rargs, kwargs, limit + grace, tags, view)
+
+        return payload
 
-            payload = func(*args, **kwargs)
-            if ENABLED and limit > 0:
-                _save(name, args, kwargs, payload)
+    if not ENABLED or limit <= 0:
+        return func(*args, **kwargs)
+
+    key = _get_key(name, rargs, kwargs)
 
+    owner = _lock(key)
+    if owner is None:
+        cached, payload = _wait(key, limit + grace)
+        if cached:
             return payload
 
-        return memoizer
+    try:
+        # stored results have to outlive the grace period to be served stale
+        revalidated, payload = _fetch(func, name, key, args, kwargs, limit + grace)
+        if not revalidated:
+            _save(name, rargs, kwargs, payload, limit=limit + grace,
+                  tags=_format_tags(tags, signature, args, kwargs), view=view)
+    finally:
+        _unlock(key, owner)
+
+    return payload
+
+
+def _fetch(func, name, key, args, kwargs, limit):
+    """
+    Call the function, conditional requests it makes are sent with the etag of the key's
+    expired result and a 304 extends the expired result instead of replacing it
+
+    :return: whether the expired result was revalidated and the result
+    :rtype: tuple
+    """
+    if not CONDITIONAL_REQUESTS:
+        return False, func(*args, **kwargs)
+
+    try:
+        etag = STORE.etag(key)
+    except:  # pylint: disable=bare-except
+        etag = ''
+
+    payload, state = _call_revalidating(func, args, kwargs, etag)
+
+    if state.sent:
+        try:
+            STORE.count_revalidation(name, state.not_modified)
+        except:  # pylint: disable=bare-except
+            pass
+
+    if state.not_modified:
+        try:
+            result = STORE.extend(key, limit + ETAG_RETENTION)
+        except:  # pylint: disable=bare-except
+            result = None
+
+        if result is not None:
+            MEMORY.set(key, *result)
+            return True, result[0]
+
+        # the expired result was evicted meanwhile, fetch it again
+        payload, _ = _call_revalidating(func, args, kwargs, '')
+
+    return False, payload
+
+
+def _call_revalidating(func, args, kwargs, etag):
+    state = Revalidation(etag)
+
+    previous = revalidation()
+    REVALIDATION.state = state
+
+    try:
+        return func(*args, **kwargs), state
+    finally:
+        REVALIDATION.state = previous
+
+
+def _lock(key):
+    """
+    :return: owner id of the lock or None if another caller is already fetching the key
+    :rtype: str | None
+    """
+    owner = str(uuid4().hex)
+
+    try:
+        if STORE.lock(key, owner, LOCK_TIMEOUT):
+            return owner
+    except:  # pylint: disable=bare-except
+        # fetch without coalescing rather than failing the request
+        return owner
+
+    return None
+
+
+def _unlock(key, owner):
+    if owner is None:
+        return
+
+    try:
+        STORE.unlock(key, owner)
+    except:  # pylint: disable=bare-except
+        pass
+
+
+def _wait(key, limit):
+    """
+    Wait for the caller holding the lock on the key to cache its result
+
+    :return: whether a result was cached while waiting and the cached result
+    :rtype: tuple
+    """
+    deadline = time.time() + LOCK_TIMEOUT
+
+    while time.time() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+
+        try:
+            result = STORE.get(key, limit)
+            if result is not None:
+                MEMORY.set(key, *result)
+                return True, result[0]
+
+            # the owner finished without caching a result, ie. the request failed
+            if not STORE.locked(key):
+                break
+
+        except:  # pylint: disable=bare-except
+            break
+
+    return False, None
+
+
+def _revalidate(func, name, signature, args, rargs, kwargs, limit, tags, view):  # pylint: disable=too-many-arguments
+    key = _get_key(name, rargs, kwargs)
+
+    with REVALIDATING_LOCK:
+        if key in REVALIDATING:
+            return
+
+        REVALIDATING.add(key)
+
+    # the worker calls the memoized function itself, not the api method's decorators wrapping
+    # it. refresh the access token and record the quota charged by the request as they do
+    owner = args[0] if args else None
+
+    def refresh():
+        try:
+            if callable(getattr(owner, 'refresh_token', None)):
+                owner.refresh_token()
+
+            try:
+                revalidated, payload = _fetch(func, name, key, args, kwargs, limit)
+            finally:
+                owner_quota = getattr(owner, 'quota', None)
+                if owner_quota is not None:
+                    owner_quota.record_pending()
+
+            # keep serving the stale result rather than caching a failed request
+            if revalidated or (isinstance(payload, dict) and 'error' in payload):
+                return
+
+            _save(name, rargs, kwargs, payload, limit=limit,
+                  tags=_format_tags(tags, signature, args, kwargs), view=view)
+
+        except:  # pylint: disable=bare-except
+            pass
+
+        finally:
+            with REVALIDATING_LOCK:
+                REVALIDATING.discard(key)
+
+    try:
+        REVALIDATE_QUEUE.put_nowait(refresh)
+    except queue.Full:
+        with REVALIDATING_LOCK:
+            REVALIDATING.discard(key)
+        return
+
+    _start_revalidate_worker()
+
+
+def _start_revalidate_worker():
+    global REVALIDATE_WORKER  # pylint: disable=global-statement
+
+    with REVALIDATING_LOCK:
+        if REVALIDATE_WORKER is not None and REVALIDATE_WORKER.is_alive():
+            return
+
+        REVALIDATE_WORKER = threading.Thread(target=_revalidate_worker,
+                                             name='memoizer-revalidate', daemon=True)
+        REVALIDATE_WORKER.start()
+
+
+def _revalidate_worker():
+    while True:
+        refresh = REVALIDATE_QUEUE.get()
+        try:
+            refresh()
+        finally:
+            REVALIDATE_QUEUE.task_done()
+
+
+def invalidates(*tags):
+    """
+    Invalidate the cached results labelled with the provided tag templates
+    after the decorated function/method has been called
+
+    :param tags: invalidation tag templates filled with the call's arguments,
+                 ie. 'playlist:{playlist_id}'
+    :type tags: str
+    """
+
+    def wrap(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def invalidator(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                invalidate(*_format_tags(tags, signature, args, kwargs))
+
+        return invalidator
 
     return wrap
 
 
 make_path()
+migrate_legacy_cache()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCache:
+    """
+    Bounded least recently used cache kept in the memory of the current interpreter
+
+    Payloads are returned as stored, callers must treat them as read-only.
+    """
+
+    def __init__(self, max_items=250):
+        self._max_items = max_items
+
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._generation = None
+
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def max_items(self):
+        return int(self._max_items)
+
+    @max_items.setter
+    def max_items(self, value):
+        self._max_items = int(value)
+
+    def get(self, key, limit):
+        with self._lock:
+            item = self._items.get(key)
+
+            if item is None or item[0] < time.time() - limit:
+                self._misses += 1
+                return None
+
+            self._items.move_to_end(key)
+            self._hits += 1
+            return item[1], item[0]
+
+    def set(self, key, payload, timestamp=None):
+        if self.max_items < 1:
+            return
+
+        with self._lock:
+            self._items[key] = (timestamp or time.time(), payload)
+            self._items.move_to_end(key)
+
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def remove(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def validate(self, generation):
+        """
+        Drop all items when the generation differs from the one the items were cached under
+
+        :param generation: current generation, changed whenever cached results become invalid
+        :type generation: str
+        """
+        with self._lock:
+            if generation != self._generation:
+                self._items.clear()
+                self._generation = generation
+
+    def info(self):
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'max_items': self.max_items,
+                'hits': self._hits,
+                'misses': self._misses,
+            }
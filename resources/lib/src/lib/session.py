@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+import os
+import threading
+from uuid import uuid4
+
+import xbmcgui  # pylint: disable=import-error
+
+from ..constants import ADDON_ID
+from ..constants import ADDONDATA_PATH
+from ..storage import users
+from .context import Context
+from .logger import Log
+
+LOG = Log('lib', __file__)
+
+# bumped by the service when the settings change, so every process drops its session
+GENERATION_PROPERTY = '%s-session-generation' % ADDON_ID
+
+SETTINGS_FILENAME = os.path.join(ADDONDATA_PATH, 'settings.xml')
+
+SESSION = None
+SESSION_LOCK = threading.Lock()
+
+
+def _modified(filename):
+    try:
+        return os.stat(filename).st_mtime_ns
+    except OSError:
+        return None
+
+
+def bump_generation():
+    xbmcgui.Window(10000).setProperty(GENERATION_PROPERTY, str(uuid4().hex))
+
+
+def get_session():
+    """
+    :return: the session of this process, created on first use
+    :rtype: Session
+    """
+    global SESSION  # pylint: disable=global-statement
+
+    with SESSION_LOCK:
+        if SESSION is None:
+            SESSION = Session()
+
+    return SESSION
+
+
+class Session:
+    """
+    Keeps the context's addon, settings, translator and api, with its user storage, warm
+    across invocations while the interpreter is reused (reuselanguageinvoker)
+
+    Each invocation compares the settings generation, the modification time of settings.xml
+    and the signature of users.xml with the ones seen by the previous invocation. Everything
+    is dropped when the settings changed, only the api when the users changed.
+    """
+
+    def __init__(self):
+        self._context = Context()
+
+        self._settings_state = None
+        self._users_state = None
+
+        self.invocations = 0
+
+    def context(self):
+        """
+        Validate the kept objects and prepare the context for the next invocation
+
+        :return: context with the arguments of the previous invocation cleared
+        :rtype: Context
+        """
+        settings_state = (
+            xbmcgui.Window(10000).getProperty(GENERATION_PROPERTY),
+            _modified(SETTINGS_FILENAME)
+        )
+        users_state = users.current_signature()
+
+        if settings_state != self._settings_state:
+            if self._settings_state is not None:
+                LOG.debug('Session: settings changed, dropping the session')
+
+            self._drop_api_settings()
+            self._context.reset(settings=True)
+
+        elif users_state != self._users_state:
+            LOG.debug('Session: users changed, dropping the api')
+            self._context.reset(api=True)
+
+        else:
+            self._context.reset()
+
+        self._settings_state = settings_state
+        self._users_state = users_state
+
+        self.invocations += 1
+        return self._context
+
+    def _drop_api_settings(self):
+        if not self._context.has_api:
+            return
+
+        # the api was imported to construct it, settings read by its memoizer are kept there
+        # pylint: disable=import-outside-toplevel
+        from ..api.api import SETTINGS
+        SETTINGS.clear()
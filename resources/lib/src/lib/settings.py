@@ -129,6 +129,10 @@ class Settings:
     def hdr(self):
         return self.get_bool('hdr')
 
+    @property
+    def progressive_playlists(self):
+        return self.get_bool('playlist.progressive')
+
     @property
     def language(self):
         return self.get_string('language')
@@ -177,6 +181,10 @@ class Settings:
     def function_cache_ttl(self):
         return self.get_int('cache.ttl.function')
 
+    @property
+    def function_cache_grace(self):
+        return self.get_int('cache.grace.function')
+
     @property
     def data_cache_limit(self):
         return self.get_int('cache.limit.data')
@@ -24,19 +24,7 @@ class Storage(Database):
         return self._is_empty()
 
     def list(self):
-        payload = []
-
-        keys = self._get_ids(ascending=False)
-        for index, key in enumerate(keys):
-            if index >= self.max_item_count:
-                break
-
-            item = self._get(key)
-
-            if item:
-                payload.append(item[0])
-
-        return payload
+        return [item for _, item, _ in self._iterate(0, self.max_item_count, 'time DESC')]
 
     def clear(self):
         self._clear()
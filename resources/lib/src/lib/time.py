@@ -21,16 +21,13 @@ def strptime(timestamp, timestamp_format):
 
 
 def now():
-    # now that always has microseconds
+    # now that always has microseconds, sqlite3 stores datetimes without them when zero
     _now = datetime.datetime.now()
-
-    try:
-        _ = datetime.datetime(*(strptime(_now.strftime('%Y-%m-%d %H:%M:%S.%f'),
-                                         '%Y-%m-%d %H:%M:%S.%f')[0:6]))
-        return _now
-    except:  # pylint: disable=bare-except
+    if not _now.microsecond:
         return _now + datetime.timedelta(microseconds=1)
 
+    return _now
+
 
 def timestamp_diff(timestamp=None):
     if not timestamp:
@@ -9,29 +9,59 @@
 """
 
 import os
+import shutil
+import tempfile
 import zipfile
 
 from ..constants import ADDON_ID
+from .database import GENERATION_SUFFIX
+from .database import restore
+from .database import snapshot
+
+# write-ahead logs and journals of the databases, their contents are part of the snapshots
+JOURNAL_SUFFIXES = ('-wal', '-shm', '-journal')
+
+
+def _is_database(filename):
+    return filename.endswith('.sqlite')
+
+
+def _is_journal(filename):
+    # generation markers are local to the installation, see database.bump_generation
+    return filename.endswith(JOURNAL_SUFFIXES) or GENERATION_SUFFIX in filename
 
 
 def compress(filename, file_list, mode='w'):
-    with zipfile.ZipFile(filename, mode) as zip_handle:
+    with zipfile.ZipFile(filename, mode) as zip_handle, \
+            tempfile.TemporaryDirectory() as temp_path:
+
+        def write(file_path):
+            if _is_journal(file_path):
+                return
+
+            arc_path = str(file_path.split(ADDON_ID)[1])
+            if not _is_database(file_path):
+                zip_handle.write(file_path, arc_path)
+                return
+
+            # databases may be in use by other processes, copy a consistent snapshot
+            snapshot_path = os.path.join(temp_path, 'snapshot.sqlite')
+            snapshot(file_path, snapshot_path)
+            zip_handle.write(snapshot_path, arc_path)
+            os.remove(snapshot_path)
 
         for source_path in file_list:
             if not os.path.exists(source_path) or ADDON_ID not in source_path:
                 continue
 
             if os.path.isfile(source_path):
-                arc_path = source_path.split(ADDON_ID)[1]
-                zip_handle.write(source_path, arc_path)
+                write(source_path)
                 continue
 
             if os.path.isdir(source_path):
                 for folder, _, filenames in os.walk(source_path):
                     for name in filenames:
-                        file_path = os.path.join(folder, name)
-                        arc_path = str(file_path.split(ADDON_ID)[1])
-                        zip_handle.write(file_path, arc_path)
+                        write(os.path.join(folder, name))
                 continue
 
 
@@ -39,5 +69,25 @@ def decompress(filename, path):
     if not os.path.exists(filename) or not os.path.exists(path) or ADDON_ID not in path:
         raise Exception
 
-    with zipfile.ZipFile(filename, 'r') as zip_handle:
-        zip_handle.extractall(path=path)
+    with zipfile.ZipFile(filename, 'r') as zip_handle, \
+            tempfile.TemporaryDirectory() as temp_path:
+        zip_handle.extractall(path=temp_path)
+
+        for folder, _, filenames in os.walk(temp_path):
+            for name in filenames:
+                if _is_journal(name):
+                    continue
+
+                source_path = os.path.join(folder, name)
+                target_path = os.path.join(path, os.path.relpath(source_path, temp_path))
+
+                # databases are restored into the live files, other processes may have them open
+                if _is_database(name) and os.path.exists(target_path):
+                    restore(source_path, target_path)
+                    continue
+
+                target_folder = os.path.dirname(target_path)
+                if not os.path.exists(target_folder):
+                    os.makedirs(target_folder)
+
+                shutil.copyfile(source_path, target_path)
@@ -8,7 +8,6 @@
     See LICENSES/GPL-2.0-only.txt for more information.
 """
 
-import arrow
 import xbmcgui  # pylint: disable=import-error
 import xbmcplugin  # pylint: disable=import-error
 
@@ -69,6 +68,8 @@ def invoke(context, page_token='', event_type='live', order=DEFAULT_ORDER):
         'fields': 'items(kind,id(videoId))',
     }
     if event_type == 'upcoming':
+        import arrow  # pylint: disable=import-outside-toplevel
+
         published_after = arrow.utcnow()
         published_after = published_after.shift(months=-6)
         api_arguments['published_after'] = published_after
@@ -13,14 +13,26 @@ import xbmcplugin  # pylint: disable=import-error
 
 from ..constants import MODES
 from ..generators.video import video_generator
-from ..items.next_page import NextPage
 from ..lib.sorting import set_video_sort_methods
-from ..lib.url_utils import create_addon_path
+from .utils import get_page
+from .utils import get_page_items
 
 
-def invoke(context, page_token='', region_code=''):
+def invoke(context, page_token='', region_code='', page=1):
     xbmcplugin.setContent(context.handle, 'videos')
 
+    listing = {
+        'mode': str(MODES.MOST_POPULAR),
+    }
+
+    if region_code:
+        listing['region_code'] = region_code
+
+    page, page_token = get_page(context, listing, page, page_token)
+    if page is None:
+        xbmcplugin.endOfDirectory(context.handle, False)
+        return
+
     payload = context.api.most_popular(
         page_token=page_token,
         region_code=region_code,
@@ -28,16 +40,7 @@ def invoke(context, page_token='', region_code=''):
     )
     items = list(video_generator(context, payload.get('items', [])))
 
-    page_token = payload.get('nextPageToken')
-    if page_token:
-        directory = NextPage(
-            label=context.i18n('Next Page'),
-            path=create_addon_path({
-                'mode': str(MODES.MOST_POPULAR),
-                'page_token': page_token
-            })
-        )
-        items.append(tuple(directory))
+    items += get_page_items(context, listing, page, payload)
 
     if items:
         xbmcplugin.addDirectoryItems(context.handle, items, len(items))
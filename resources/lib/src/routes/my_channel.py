@@ -13,48 +13,31 @@ import xbmcplugin  # pylint: disable=import-error
 
 from ..constants import MODES
 from ..generators.video import video_generator
-from ..items.next_page import NextPage
 from ..lib.sorting import set_video_sort_methods
-from ..lib.url_utils import create_addon_path
+from .utils import get_page
+from .utils import get_page_items
 
 
-def invoke(context, page_token=''):
+def invoke(context, page_token='', page=1):
     xbmcplugin.setContent(context.handle, 'videos')
 
-    payload = context.api.channel_by_username('mine')
+    listing = {
+        'mode': str(MODES.MY_CHANNEL),
+    }
 
-    channel_id = payload.get('items', [{}])[0].get('id', '')
-    if not channel_id:
+    page, page_token = get_page(context, listing, page, page_token)
+    if page is None:
         xbmcplugin.endOfDirectory(context.handle, False)
         return
 
-    payload = context.api.channels(channel_id=channel_id)
-
-    channel_item = payload.get('items', [{}])[0]
-    upload_playlist = channel_item.get('contentDetails', {}) \
-        .get('relatedPlaylists', {}).get('uploads', '')
-
-    if not upload_playlist:
+    payload = context.api.channel_videos('mine', page_token=page_token)
+    if not payload:
         xbmcplugin.endOfDirectory(context.handle, False)
         return
 
-    payload = context.api.playlist_items(
-        upload_playlist,
-        page_token=page_token,
-        fields='items(kind,id,snippet(playlistId,resourceId/videoId))'
-    )
     items = list(video_generator(context, payload.get('items', [])))
 
-    page_token = payload.get('nextPageToken')
-    if page_token:
-        directory = NextPage(
-            label=context.i18n('Next Page'),
-            path=create_addon_path({
-                'mode': str(MODES.MY_CHANNEL),
-                'page_token': page_token
-            })
-        )
-        items.append(tuple(directory))
+    items += get_page_items(context, listing, page, payload)
 
     if items:
         xbmcplugin.addDirectoryItems(context.handle, items, len(items))
@@ -8,21 +8,29 @@
     See LICENSES/GPL-2.0-only.txt for more information.
 """
 
+import threading
 from copy import deepcopy
 from html import unescape
 
-import arrow
 import xbmc  # pylint: disable=import-error
 import xbmcplugin  # pylint: disable=import-error
 
 from ..api.utils import choose_subtitles
 from ..generators.data_cache import get_cached
 from ..generators.utils import get_thumbnail
+from ..generators.video import get_id
+from ..generators.video import playlist_item_generator
 from ..generators.video import video_generator
 from ..items.stream import Stream
+from ..lib.logger import Log
 from ..lib.pickle import write_pickled
 from ..lib.time import iso8601_duration_to_seconds
 
+LOG = Log('routes', __file__)
+
+PROGRESSIVE_FIELDS = 'items(kind,id,snippet(playlistId,title,videoOwnerChannelTitle,' \
+                     'thumbnails,resourceId/videoId))'
+
 
 def invoke(context, video_id='', playlist_id='', prompt_subtitles=False, start_offset=None):
     if video_id and not playlist_id:
@@ -35,7 +43,11 @@ def invoke(context, video_id='', playlist_id='', prompt_subtitles=False, start_o
 
 
 def play_playlist(context, playlist_id, video_id):
-    successful = create_playlist(context, playlist_id, video_id)
+    if context.settings.progressive_playlists:
+        successful = create_progressive_playlist(context, playlist_id, video_id)
+    else:
+        successful = create_playlist(context, playlist_id, video_id)
+
     if successful:
 
         playlist, start_position, start_item = successful
@@ -47,40 +59,66 @@ def play_playlist(context, playlist_id, video_id):
 
 
 def create_playlist(context, playlist_id, video_id):
-    playlist_items = []
+    playlist_items = context.api.fetch_all_pages(
+        context.api.playlist_items,
+        playlist_id,
+        executor=context.executor,
+        fields='items(kind,id,snippet(playlistId,resourceId/videoId))'
+    )
+
+    if not playlist_items:
+        return None
+
+    list_items = list(video_generator(context, playlist_items))
+
+    if not list_items:
+        return None
+
+    start_position = 0
+    start_item = None
+
+    playlist = xbmc.PlayList(xbmc.PLAYLIST_VIDEO)
+    playlist.clear()
+
+    for index, (path, list_item, _) in enumerate(list_items):
+        if list_item.getProperty('video_id') == video_id:
+            start_position = index
+            start_item = list_item
+
+        playlist.add(path, list_item)
 
-    page_token = True
-    while page_token:
-        if page_token is True:
-            page_token = ''
+    return playlist, start_position, start_item
+
+
+def create_progressive_playlist(context, playlist_id, video_id):
+    """
+    Queue lightweight items from the first pages, up to the page of the selected video,
+    and add the remaining pages from a background thread
+    """
+    playlist_items = []
+    page_token = ''
 
+    while True:
         payload = context.api.playlist_items(
             playlist_id,
             page_token=page_token,
-            fields='items(kind,id,snippet(playlistId,resourceId/videoId))'
+            fields=PROGRESSIVE_FIELDS
         )
 
-        playlist_items.extend(payload.get('items', []))
-
+        items = payload.get('items', [])
+        playlist_items += items
         page_token = payload.get('nextPageToken')
-        if not page_token:
-            break
 
-    if not playlist_items:
-        return None
-
-    list_items = []
-
-    # make lists of 50 for api requests that follow
-    groups = [playlist_items[index:index + 50] for index in range(0, len(playlist_items), 50)]
-    for group in groups:
-        list_items += list(video_generator(context, group))
+        if not page_token or 'error' in payload or not video_id or \
+                video_id in [get_id(item) for item in items]:
+            break
 
+    list_items = list(playlist_item_generator(playlist_items))
     if not list_items:
         return None
 
     start_position = 0
-    start_item = None
+    start_item = list_items[0][1]
 
     playlist = xbmc.PlayList(xbmc.PLAYLIST_VIDEO)
     playlist.clear()
@@ -92,10 +130,58 @@ def create_playlist(context, playlist_id, video_id):
 
         playlist.add(path, list_item)
 
+    if page_token:
+        PlaylistQueueThread(context, playlist_id, page_token, playlist.size()).start()
+
     return playlist, start_position, start_item
 
 
-def play_single(context, video_id, prompt_subtitles=False, start_offset=None):
+class PlaylistQueueThread(threading.Thread):
+    """
+    Add the remaining pages of a playlist to the queue as they are requested, stops if the
+    queue is changed by something else in the meantime
+    """
+
+    def __init__(self, context, playlist_id, page_token, queue_size):
+        super().__init__()
+
+        self.context = context
+        self.playlist_id = playlist_id
+
+        self.page_token = page_token
+        self.queue_size = queue_size
+
+    def run(self):
+        playlist = xbmc.PlayList(xbmc.PLAYLIST_VIDEO)
+        monitor = xbmc.Monitor()
+
+        while self.page_token:
+            payload = self.context.api.playlist_items(
+                self.playlist_id,
+                page_token=self.page_token,
+                fields=PROGRESSIVE_FIELDS
+            )
+
+            if 'error' in payload:
+                LOG.debug('Playlist queue failed, stopped adding %s' % self.playlist_id)
+                return
+
+            if monitor.abortRequested() or playlist.size() != self.queue_size:
+                LOG.debug('Playlist queue changed, stopped adding %s' % self.playlist_id)
+                return
+
+            for path, list_item, _ in playlist_item_generator(payload.get('items', [])):
+                playlist.add(path, list_item)
+
+            self.queue_size = playlist.size()
+            self.page_token = payload.get('nextPageToken')
+
+        LOG.debug('Playlist queue completed: %s, %d items' % (self.playlist_id, self.queue_size))
+
+
+def play_single(context, video_id, prompt_subtitles=False, start_offset=None):  # pylint: disable=too-many-locals
+    import arrow  # pylint: disable=import-outside-toplevel
+
     quality = context.api.quality(
         context.settings.video_quality,
         limit_30fps=context.settings.limit_to_30fps,
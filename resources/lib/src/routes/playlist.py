@@ -13,10 +13,10 @@ import xbmcplugin  # pylint: disable=import-error
 
 from ..constants import MODES
 from ..generators.video import video_generator
-from ..items.next_page import NextPage
 from ..lib.sorting import set_video_sort_methods
-from ..lib.url_utils import create_addon_path
 from ..storage.users import UserStorage
+from .utils import get_page
+from .utils import get_page_items
 
 users = UserStorage()
 WATCH_LATER_PLAYLIST = users.watchlater_playlist
@@ -24,12 +24,22 @@ HISTORY_PLAYLIST = users.history_playlist
 del users
 
 
-def invoke(context, playlist_id, page_token='', mine=False):
+def invoke(context, playlist_id, page_token='', mine=False, page=1):
     xbmcplugin.setContent(context.handle, 'videos')
 
     if not mine and playlist_id in [WATCH_LATER_PLAYLIST, HISTORY_PLAYLIST]:
         mine = True
 
+    listing = {
+        'mode': str(MODES.PLAYLIST),
+        'playlist_id': playlist_id,
+    }
+
+    page, page_token = get_page(context, listing, page, page_token)
+    if page is None:
+        xbmcplugin.endOfDirectory(context.handle, False)
+        return
+
     payload = context.api.playlist_items(
         playlist_id,
         page_token=page_token,
@@ -37,17 +47,7 @@ def invoke(context, playlist_id, page_token='', mine=False):
     )
     items = list(video_generator(context, payload.get('items', []), mine=mine))
 
-    page_token = payload.get('nextPageToken')
-    if page_token:
-        directory = NextPage(
-            label=context.i18n('Next Page'),
-            path=create_addon_path({
-                'mode': str(MODES.PLAYLIST),
-                'playlist_id': playlist_id,
-                'page_token': page_token
-            })
-        )
-        items.append(tuple(directory))
+    items += get_page_items(context, listing, page, payload)
 
     if items:
         xbmcplugin.addDirectoryItems(context.handle, items, len(items))
@@ -11,8 +11,8 @@
 import xbmcgui  # pylint: disable=import-error
 import xbmcplugin  # pylint: disable=import-error
 
+from ..api.uploads import uploads_playlist
 from ..constants import MODES
-from ..generators.data_cache import get_cached
 from ..generators.playlist import playlist_generator
 from ..items.directory import Directory
 from ..items.next_page import NextPage
@@ -25,17 +25,18 @@ def invoke(context, channel_id, page_token=''):
     if channel_id == 'mine':  # don't cache these, it would require an additional request to achieve
         payload = context.api.channels(channel_id=channel_id)
         channel_item = payload.get('items', [{}])[0]
-    else:
-        payload = get_cached(context, context.api.channels, [channel_id])
-        channel_item = payload.get(channel_id, {})
 
-    if not channel_item:
-        xbmcplugin.endOfDirectory(context.handle, False)
-        return
+        if not channel_item:
+            xbmcplugin.endOfDirectory(context.handle, False)
+            return
 
-    content_details = channel_item.get('contentDetails', {})
-    related_playlists = content_details.get('relatedPlaylists', {})
-    upload_playlist = related_playlists.get('uploads', '')
+        content_details = channel_item.get('contentDetails', {})
+        related_playlists = content_details.get('relatedPlaylists', {})
+        upload_playlist = related_playlists.get('uploads', '')
+
+    else:
+        related_playlists = {}
+        upload_playlist = uploads_playlist(context.api, channel_id)
 
     items = []
 
@@ -18,7 +18,6 @@ from ..constants import MODES
 from ..generators.channel import channel_generator
 from ..generators.playlist import playlist_generator
 from ..generators.video import video_generator
-from ..items.next_page import NextPage
 from ..items.search_query import SearchQuery
 from ..lib.sorting import set_video_sort_methods
 from ..lib.txt_fmt import bold
@@ -27,13 +26,15 @@ from ..lib.url_utils import unquote
 from ..storage.search_cache import SearchCache
 from ..storage.search_history import SearchHistory
 from ..storage.users import UserStorage
+from .utils import get_page
+from .utils import get_page_items
 from .utils import get_sort_order
 
 DEFAULT_ORDER = 'relevance'
 
 
 def invoke(context, query='', page_token='', search_type='video',  # pylint: disable=too-many-branches
-           order=DEFAULT_ORDER, channel_id=None):
+           order=DEFAULT_ORDER, channel_id=None, page=1):
     if search_type not in ['video', 'channel', 'playlist']:
         return
 
@@ -46,6 +47,7 @@ def invoke(context, query='', page_token='', search_type='video',  # pylint: dis
         order = order or DEFAULT_ORDER
         if order != DEFAULT_ORDER:
             page_token = ''
+            page = 1
 
     if (not query and
             'mode=%s' % str(MODES.SEARCH_QUERY) in xbmc.getInfoLabel('Container.FolderPath')):
@@ -66,9 +68,30 @@ def invoke(context, query='', page_token='', search_type='video',  # pylint: dis
         xbmcplugin.endOfDirectory(context.handle, False)
         return
 
-    items = []
     quoted_query = quote(query)
 
+    addon_query = {
+        'mode': str(MODES.SEARCH_QUERY),
+        'query': quoted_query,
+        'search_type': search_type
+    }
+
+    if search_type == 'video':
+        del addon_query['search_type']
+
+    if order != DEFAULT_ORDER:
+        addon_query['order'] = order
+
+    if channel_id:
+        addon_query['channel_id'] = channel_id
+
+    page, page_token = get_page(context, addon_query, page, page_token)
+    if page is None:
+        xbmcplugin.endOfDirectory(context.handle, False)
+        return
+
+    items = []
+
     if not page_token and search_type == 'video' and not channel_id:
 
         directory = SearchQuery(
@@ -93,12 +116,6 @@ def invoke(context, query='', page_token='', search_type='video',  # pylint: dis
 
         items.append(tuple(directory))
 
-    addon_query = {
-        'mode': str(MODES.SEARCH_QUERY),
-        'query': quoted_query,
-        'search_type': search_type
-    }
-
     payload = {}
     request_arguments = {
         'query': query,
@@ -116,7 +133,6 @@ def invoke(context, query='', page_token='', search_type='video',  # pylint: dis
         payload = context.api.search(**request_arguments)
 
         items += list(video_generator(context, payload.get('items', [])))
-        del addon_query['search_type']
 
     elif search_type == 'channel':
         request_arguments['fields'] = 'items(kind,id(channelId))'
@@ -133,18 +149,7 @@ def invoke(context, query='', page_token='', search_type='video',  # pylint: dis
     if not payload:
         return
 
-    page_token = payload.get('nextPageToken')
-    if page_token:
-        if order != DEFAULT_ORDER:
-            addon_query['order'] = order
-
-        addon_query['page_token'] = page_token
-
-        directory = NextPage(
-            label=context.i18n('Next Page'),
-            path=create_addon_path(addon_query)
-        )
-        items.append(tuple(directory))
+    items += get_page_items(context, addon_query, page, payload)
 
     if not items:
         xbmcplugin.endOfDirectory(context.handle, False)
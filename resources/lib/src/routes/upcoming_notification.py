@@ -8,7 +8,6 @@
     See LICENSES/GPL-2.0-only.txt for more information.
 """
 
-import arrow
 import xbmcgui  # pylint: disable=import-error
 
 from ..lib.txt_fmt import bold
@@ -16,6 +15,8 @@ from ..lib.url_utils import unquote
 
 
 def invoke(context, title, timestamp):
+    import arrow  # pylint: disable=import-outside-toplevel
+
     if title and '%' in title:
         title = unquote(title)
 
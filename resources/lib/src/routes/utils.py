@@ -11,12 +11,12 @@
 import xbmcgui  # pylint: disable=import-error
 
 from ..constants import MODES
-from ..lib.memoizer import reset_cache
+from ..items.next_page import NextPage
+from ..lib.url_utils import create_addon_path
+from ..storage.page_tokens import PageTokens
 
 
 def get_sort_order(context):
-    reset_cache()
-
     choice_ids = []
     choice_labels = []
 
@@ -52,3 +52,103 @@ def get_sort_order(context):
         return None
 
     return choice_ids[result]
+
+
+def get_page(context, listing, page=1, page_token=''):
+    """
+    Resolve the requested page of a listing to a page token, prompting for the page number
+    when `page` is 'prompt'. Tokens previously returned by the api are preferred over
+    calculated ones.
+
+    :param listing: addon query of the listing without paging parameters
+    :type listing: dict
+    :param page: page number or 'prompt'
+    :type page: int | str
+    :param page_token: page token when already known
+    :type page_token: str
+    :return: (page number, page token), the page number is None if the prompt was cancelled
+    :rtype: tuple
+    """
+    if page == 'prompt':
+        result = xbmcgui.Dialog().numeric(0, context.i18n('Enter a page number'))
+        try:
+            page = int(result)
+        except (TypeError, ValueError):
+            return None, ''
+
+        if page < 1:
+            return None, ''
+
+        page_token = ''
+
+    try:
+        page = max(int(page), 1)
+    except (TypeError, ValueError):
+        page = 1
+
+    if page == 1 or page_token:
+        return page, page_token
+
+    page_token = PageTokens().get(_listing_key(listing), page)
+    if not page_token:
+        try:
+            page_token = context.api.calculate_next_page_token(page)
+        except IndexError:
+            page_token = ''
+
+    return page, page_token
+
+
+def get_page_items(context, listing, page, payload):
+    """
+    'Next Page' and 'Go to page...' items for a listing, the next page token is remembered
+    for later jumps
+
+    :param listing: addon query of the listing without paging parameters
+    :type listing: dict
+    :param page: current page number
+    :type page: int
+    :param payload: api response of the current page
+    :type payload: dict
+    :return: list of directory items
+    :rtype: list
+    """
+    payload = payload or {}
+    items = []
+
+    page_token = payload.get('nextPageToken')
+    if page_token:
+        page_tokens = PageTokens()
+        listing_key = _listing_key(listing)
+
+        # revisited pages return the same token, only write new or changed ones
+        if page_tokens.get(listing_key, page + 1) != page_token:
+            page_tokens.update(listing_key, page + 1, page_token)
+
+        query = dict(listing)
+        query.update({
+            'page_token': page_token,
+            'page': str(page + 1)
+        })
+
+        directory = NextPage(
+            label=context.i18n('Next Page'),
+            path=create_addon_path(query)
+        )
+        items.append(tuple(directory))
+
+    if page_token or page > 1:
+        query = dict(listing)
+        query['page'] = 'prompt'
+
+        directory = NextPage(
+            label=context.i18n('Go to page...'),
+            path=create_addon_path(query)
+        )
+        items.append(tuple(directory))
+
+    return items
+
+
+def _listing_key(listing):
+    return create_addon_path(sorted(listing.items()))
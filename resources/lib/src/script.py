@@ -8,8 +8,8 @@
     See LICENSES/GPL-2.0-only.txt for more information.
 """
 
-from .api import API
 from .constants import SCRIPT_MODES
+from .lib import import_profile
 from .lib.context import Context
 from .lib.logger import Log
 from .lib.routing import Router
@@ -159,9 +159,6 @@ def invoke(argv):
         (str(CONTEXT.handle), CONTEXT.mode, CONTEXT.query)
     )
 
-    CONTEXT.api = API(
-        language=CONTEXT.settings.language,
-        region=CONTEXT.settings.region
-    )
-
     router.invoke(CONTEXT.query)
+
+    import_profile.finish('script', CONTEXT.mode)
@@ -8,13 +8,10 @@
     See LICENSES/GPL-2.0-only.txt for more information.
 """
 
-import shutil
-
 import xbmcgui  # pylint: disable=import-error
-import xbmcvfs  # pylint: disable=import-error
 
 from ..constants.media import LOGO_SMALL
-from ..lib.memoizer import PATH as cache_path
+from ..lib.memoizer import delete_cache
 from ..lib.memoizer import make_path
 from ..lib.memoizer import reset_cache
 from ..storage.data_cache import DataCache
@@ -51,10 +48,9 @@ def invoke(context, action, cache_type):
 
         if action == 'delete':
             try:
-                if xbmcvfs.exists(cache.filename):
-                    success = xbmcvfs.delete(cache.filename)
-                    if not success:
-                        raise Exception
+                success = cache.delete()
+                if not success:
+                    raise Exception
 
                 xbmcgui.Dialog().notification(
                     addon_name,
@@ -96,9 +92,7 @@ def invoke(context, action, cache_type):
 
         if action == 'delete':
             try:
-                if xbmcvfs.exists(cache_path):
-                    shutil.rmtree(cache_path)
-                    make_path()
+                delete_cache()
                 xbmcgui.Dialog().notification(
                     addon_name,
                     context.i18n('Function cache was deleted'),
@@ -15,7 +15,6 @@ import xbmcgui  # pylint: disable=import-error
 
 from ..constants.media import LOGO_SMALL
 from ..generators.utils import get_thumbnail
-from ..lib.memoizer import reset_cache
 from ..lib.txt_fmt import bold
 from ..lib.url_utils import unquote
 from ..storage.users import UserStorage
@@ -60,7 +59,7 @@ def invoke(context, action, video_id='', video_title='', playlist_id='',  # pyli
             message = context.i18n('%s playlist deleted') % bold(playlist_title)
 
     elif action == 'remove':
-        result = remove(context, playlistitem_id)
+        result = remove(context, playlistitem_id, playlist_id)
         if not result:
             return
 
@@ -85,7 +84,6 @@ def invoke(context, action, video_id='', video_title='', playlist_id='',  # pyli
             sound=False
         )
 
-        reset_cache()
         xbmc.executebuiltin('Container.Refresh')
 
 
@@ -93,7 +91,7 @@ def required_arguments_check(action, video_id, playlist_id, playlistitem_id):
     if action == 'add' and not video_id:
         return False
 
-    if action == 'remove' and not playlistitem_id:
+    if action == 'remove' and (not playlistitem_id or not playlist_id):
         return False
 
     if action == 'delete' and not playlist_id:
@@ -253,8 +251,8 @@ def delete(context, playlist_id, playlist_title):
     return success
 
 
-def remove(context, playlistitem_id):
-    payload = context.api.remove_from_playlist(playlistitem_id)
+def remove(context, playlistitem_id, playlist_id):
+    payload = context.api.remove_from_playlist(playlistitem_id, playlist_id)
     try:
         return int(payload.get('error', {}).get('code', 204)) == 204
     except ValueError:
@@ -12,7 +12,6 @@ import xbmc  # pylint: disable=import-error
 
 from ..dialogs.autoplay_related import AutoplayRelated
 from ..dialogs.common import open_dialog
-from ..lib.memoizer import reset_cache
 from ..lib.utils import wait_for_busy_dialog
 from ..storage.users import UserStorage
 from .utils import rate
@@ -63,12 +62,11 @@ def invoke(context, video_id, position=-1, live=False):
                 context.api.video_id_to_playlist_item_id(users.watchlater_playlist, video_id)
 
             if playlist_item_id:
-                _ = context.api.remove_from_playlist(playlist_item_id)
+                _ = context.api.remove_from_playlist(playlist_item_id,
+                                                     users.watchlater_playlist)
         except:  # pylint: disable=bare-except
             pass
 
-    reset_cache()
-
 
 def post_play(context, users):
     if context.settings.post_play_rate:
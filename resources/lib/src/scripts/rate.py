@@ -10,12 +10,10 @@
 
 import xbmc  # pylint: disable=import-error
 
-from ..lib.memoizer import reset_cache
 from .utils import rate
 
 
 def invoke(context, video_id):
     rate(context, video_id)
 
-    reset_cache()
     xbmc.executebuiltin('Container.Refresh')
@@ -12,7 +12,6 @@ import xbmc  # pylint: disable=import-error
 import xbmcgui  # pylint: disable=import-error
 
 from ..constants.media import LOGO_SMALL
-from ..lib.memoizer import reset_cache
 from ..lib.txt_fmt import bold
 from ..lib.url_utils import unquote
 
@@ -44,8 +43,6 @@ def invoke(context, action, channel_id='', subscription_id='', channel_name=''):
                 sound=False
             )
 
-            reset_cache()
-
     elif action == 'remove':
         if not subscription_id:
             return
@@ -69,5 +66,4 @@ def invoke(context, action, channel_id='', subscription_id='', channel_name=''):
                 sound=False
             )
 
-            reset_cache()
             xbmc.executebuiltin('Container.Refresh')
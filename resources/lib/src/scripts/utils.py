@@ -22,13 +22,17 @@ LOG = Log('scripts', __file__)
 
 
 def rate(context, video_id):
-    payload = context.api.rating(video_id)
-    try:
-        payload = payload.get('items', [{}])[0]
-    except IndexError:
-        return
+    rating = None
+
+    # the current rating is only used to hide its choice, skip it while the quota is low
+    if not context.api.quota.low:
+        payload = context.api.rating(video_id)
+        try:
+            payload = payload.get('items', [{}])[0]
+        except IndexError:
+            return
 
-    rating = payload.get('rating', 'none')
+        rating = payload.get('rating', 'none')
 
     cached_payload = get_cached(context, context.api.videos, [video_id])
     cached_video = cached_payload.get(video_id, {})
@@ -68,8 +72,9 @@ def rate(context, video_id):
         'none'
     ]
 
-    del choices[choice_map.index(rating)]
-    del choice_map[choice_map.index(rating)]
+    if rating in choice_map:
+        del choices[choice_map.index(rating)]
+        del choice_map[choice_map.index(rating)]
 
     result = xbmcgui.Dialog().select(context.i18n('Rate'), choices, useDetails=True)
     if result == -1:
@@ -8,33 +8,37 @@
     See LICENSES/GPL-2.0-only.txt for more information.
 """
 
-import os
-
 import xbmc  # pylint: disable=import-error
 import xbmcgui  # pylint: disable=import-error
-import xbmcvfs  # pylint: disable=import-error
 
-from .constants import ADDONDATA_PATH
+from .api.tokens import TokenRefresher
 from .lib.context import Context
 from .lib.memoizer import reset_cache
 from .lib.playback import CallbackPlayer
+from .lib.session import bump_generation
+
+
+class Monitor(xbmc.Monitor):
+
+    def onSettingsChanged(self):  # pylint: disable=invalid-name
+        # plugin invocations drop the settings they kept warm
+        bump_generation()
 
 
 def invoke():
     reset_cache()
 
-    user_lock = os.path.join(ADDONDATA_PATH, 'users.lock')
-    if xbmcvfs.exists(user_lock):
-        xbmcvfs.delete(user_lock)
-
     sleep_time = 10
 
     context = Context()
     window = xbmcgui.Window(10000)
     player = CallbackPlayer(context=context, window=window)
-    monitor = xbmc.Monitor()
+    monitor = Monitor()
+    tokens = TokenRefresher()
 
     while not monitor.abortRequested():
+        tokens.run()
+
         if monitor.waitForAbort(sleep_time):
             break
 
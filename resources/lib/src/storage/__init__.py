@@ -8,5 +8,5 @@
     See LICENSES/GPL-2.0-only.txt for more information.
 """
 
-__all__ = ['data_cache', 'favorite_channels', 'favorite_playlists',
-           'search_cache', 'search_history', 'users']
+__all__ = ['data_cache', 'favorite_channels', 'favorite_playlists', 'page_tokens',
+           'search_cache', 'search_history', 'uploads_playlists', 'users']
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+import os
+
+from ..constants import ADDONDATA_PATH
+from ..lib.sql_storage import Storage
+
+# pylint: disable=arguments-differ
+
+
+class PageTokens(Storage):
+    """
+    Page tokens returned by the api, per listing and page number
+    """
+
+    def __init__(self, maximum_items=5000):
+        filename = os.path.join(ADDONDATA_PATH, 'data', 'page_tokens.sqlite')
+
+        super().__init__(filename, max_item_count=maximum_items)
+
+    def get(self, listing, page):
+        item = self._get(self._make_id('%s|%d' % (listing, int(page))))
+        if item:
+            return item[0]
+
+        return ''
+
+    def update(self, listing, page, page_token):
+        self._set(self._make_id('%s|%d' % (listing, int(page))), page_token)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+"""
+
+import os
+
+from ..constants import ADDONDATA_PATH
+from ..lib.sql_storage import Storage
+
+# pylint: disable=arguments-differ
+
+
+class UploadsPlaylists(Storage):
+    """
+    Uploads playlist of each channel, they never change
+    """
+
+    def __init__(self, maximum_items=5000):
+        filename = os.path.join(ADDONDATA_PATH, 'data', 'uploads_playlists.sqlite')
+
+        super().__init__(filename, max_item_count=maximum_items)
+
+    def get(self, channel_id):
+        item = self._get(channel_id)
+        if item:
+            return item[0]
+
+        return ''
+
+    def update(self, channel_id, playlist_id):
+        self._set(channel_id, playlist_id)
@@ -9,7 +9,9 @@
 """
 
 import os
+import threading
 import time
+from copy import deepcopy
 from urllib.parse import quote
 from uuid import uuid4
 from xml.etree import ElementTree
@@ -18,11 +20,61 @@ import xbmc  # pylint: disable=import-error
 import xbmcvfs  # pylint: disable=import-error
 
 from ..constants import ADDONDATA_PATH
+from ..lib.file_lock import FileLock
 from ..lib.logger import Log
 from ..lib.url_utils import unquote
 
 LOG = Log('storage', __file__)
 
+FILENAME = os.path.join(ADDONDATA_PATH, 'users.xml')
+
+# parsed users.xml files shared by every UserStorage of the process, by filename
+# as (file signature, root), see `UserStorage.load`
+CACHE = {}
+CACHE_LOCK = threading.Lock()
+
+# replacing users.xml fails on windows while another process has it open, it is retried
+# REPLACE_ATTEMPTS times REPLACE_DELAY seconds apart before writing it in place
+REPLACE_ATTEMPTS = 5
+REPLACE_DELAY = 0.05
+
+
+def current_signature():
+    """
+    :return: identifies the content of users.xml, it changes whenever the users are saved
+    :rtype: tuple | None
+    """
+    return _file_signature(FILENAME)
+
+
+def _replace(source, destination):
+    """
+    :return: whether the destination was replaced, False if it stayed in use
+    :rtype: bool
+    """
+    for attempt in range(REPLACE_ATTEMPTS):
+        try:
+            os.replace(source, destination)
+            return True
+        except PermissionError:
+            if attempt < REPLACE_ATTEMPTS - 1:
+                time.sleep(REPLACE_DELAY)
+
+    return False
+
+
+def _file_signature(filename):
+    """
+    :return: identifies the file's content, it changes whenever the file is replaced or written
+    :rtype: tuple | None
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
 
 class UserStorage:
     __template_root = \
@@ -57,8 +109,9 @@ class UserStorage:
 
     def __init__(self):
 
-        self.filename = os.path.join(ADDONDATA_PATH, 'users.xml')
+        self.filename = FILENAME
         self.lock_filename = os.path.join(ADDONDATA_PATH, 'users.lock')
+        self._lock = FileLock(self.lock_filename)
 
         self.monitor = xbmc.Monitor()
 
@@ -262,56 +315,125 @@ class UserStorage:
             self.save()
 
     def locked(self):
-        return xbmcvfs.exists(self.lock_filename)
-
-    def lock(self):
-
-        timeout = 60.0
-        sleep_time = 0.1
-        slept_for = 0.0
-
-        while not self.monitor.abortRequested() and slept_for < timeout and self.locked():
-            if self.monitor.waitForAbort(sleep_time):
-                break
-
-            slept_for += sleep_time
-
-            LOG.debug('[%s] Attemping to aquire lock %s/%s ...' %
-                      (self._uuid, str(slept_for), str(timeout)))
-
-        if not self.locked():
-            with xbmcvfs.File(self.lock_filename, 'w') as _:
-                LOG.debug('[%s] Lock aquired' % self._uuid)
+        return self._lock.locked
 
+    def lock(self, timeout=60.0):
+        if self._lock.acquire(timeout=timeout, abort=self.monitor.abortRequested):
+            LOG.debug('[%s] Lock aquired' % self._uuid)
         else:
             LOG.error('[%s] Unable to aquire lock' % self._uuid)
 
     def unlock(self):
         if self.locked():
-            xbmcvfs.delete(self.lock_filename)
+            self._lock.release()
             LOG.debug('[%s] Lock released' % self._uuid)
 
     def load(self):
+        """
+        Load the users from the process wide cache, the file is only parsed again after it
+        changed. Saves replace the file atomically, so reading doesn't need the lock.
+        """
+        signature = _file_signature(self.filename)
+
+        with CACHE_LOCK:
+            cached = CACHE.get(self.filename)
+            if cached is not None and signature is not None and cached[0] == signature:
+                self._reset()
+                self.root = deepcopy(cached[1])
+                return
+
+        try:
+            root = ElementTree.parse(self.filename).getroot()
+        except ElementTree.ParseError:
+            # the file was written in place, wait for the writer to finish
+            owned = not self.locked()
+            if owned:
+                self.lock()
+            try:
+                signature = _file_signature(self.filename)
+                root = ElementTree.parse(self.filename).getroot()
+            finally:
+                if owned:
+                    self.unlock()
+
+        self._cache(signature, root)
+
+        self._reset()
+        self.root = root
+
+    def save(self):
         self.lock()
         try:
             if self.locked():
-                self._reset()
-                self.root = ElementTree.parse(self.filename).getroot()
+                self._write()
 
         finally:
             self.unlock()
 
-    def save(self):
+    def update_tokens(self, user_uuid, access_token, token_expiry):
+        """
+        Store a user's refreshed access token. The users are reloaded under the lock first,
+        changes saved by other processes in the meantime are kept.
+
+        :param user_uuid: uuid of the user the token belongs to
+        :type user_uuid: str
+        :param access_token: new access token
+        :type access_token: str
+        :param token_expiry: timestamp the access token expires at
+        :type token_expiry: float
+        :return: whether the token was stored
+        :rtype: bool
+        """
         self.lock()
         try:
-            if self.locked():
-                with open(self.filename, 'wb') as file_handle:
-                    file_handle.write(ElementTree.tostring(self.root,
-                                                           short_empty_elements=False,
-                                                           method='html'))
+            if not self.locked():
+                return False
+
+            self.load()
+
+            user_element = self._find_user(user_uuid)
+            if user_element is None:
+                return False
+
+            self._reset()
+            self._element_set(user_element, 'access_token', access_token)
+            self._element_set(user_element, 'token_expiry', str(token_expiry))
+            self._write()
+            return True
+
         finally:
             self.unlock()
 
+    def _write(self):
+        payload = ElementTree.tostring(self.root, short_empty_elements=False, method='html')
+        temp_filename = '%s.%s.tmp' % (self.filename, self._uuid)
+
+        try:
+            with open(temp_filename, 'wb') as file_handle:
+                file_handle.write(payload)
+                file_handle.flush()
+                os.fsync(file_handle.fileno())
+
+            if not _replace(temp_filename, self.filename):
+                LOG.debug('[%s] Unable to replace users, writing them in place' % self._uuid)
+                with open(self.filename, 'wb') as file_handle:
+                    file_handle.write(payload)
+
+        finally:
+            try:
+                os.remove(temp_filename)
+            except OSError:
+                pass
+
+        self._cache(_file_signature(self.filename), self.root)
+
+    def _cache(self, signature, root):
+        if signature is None:
+            return
+
+        with CACHE_LOCK:
+            CACHE[self.filename] = (signature, deepcopy(root))
+
     def _current_user_get(self, attrib, default=''):
         if self._user:
             return unquote(self._user.get(attrib, default))
@@ -328,11 +450,27 @@ class UserStorage:
         if not user:
             return
 
+        self._reset()
+        self._element_set(user, attrib, value)
+
+    def _find_user(self, user_uuid):
+        for user_element in self.root.findall('./user'):
+            uuid_element = user_element.find('uuid')
+
+            if not hasattr(uuid_element, 'text'):
+                continue
+
+            if unquote(uuid_element.text) == user_uuid:
+                return user_element
+
+        return None
+
+    @staticmethod
+    def _element_set(user, attrib, value):
         element = user.find(attrib)
         if not hasattr(element, 'text'):
             element = None
 
-        self._reset()
         if element is None:
             new_element = ElementTree.SubElement(user, attrib)
             new_element.text = quote(value)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+
+    Encode and decode time, and database size, of a page of 50 video resources stored
+    as pickle(json), json and with lib.codec
+
+    Requires Kodistubs (pip install Kodistubs), from the root of the repository:
+
+        python tools/benchmark_codec.py
+"""
+
+import json
+import os
+import pickle
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'resources', 'lib'))
+
+# pylint: disable=wrong-import-position,import-error
+from src.lib import codec
+
+ITEM_COUNT = 50
+PAGES = 20
+RUNS = 20
+
+WORDS = ('the video new official live music game review how to best tutorial episode full '
+         'world part first channel update trailer reaction guide vs highlights news day '
+         'edition remix cover build challenge behind scenes top minecraft recipe travel vlog '
+         'history science unboxing setup tips tricks beginner advanced stream podcast').split()
+
+
+def text(generator, count):
+    return ' '.join(generator.choice(WORDS) for _ in range(count))
+
+
+def video(generator, index):
+    """
+    A videos.list resource with the parts requested by the addon, 2-3 KiB as json
+    """
+    video_id = ''.join(generator.choice('abcdefghijklmnopqrstuvwxyz0123456789-_')
+                       for _ in range(11))
+    thumbnails = dict(
+        (name, {'url': 'https://i.ytimg.com/vi/%s/%s.jpg' % (video_id, name),
+                'width': width, 'height': height})
+        for name, width, height in [('default', 120, 90), ('medium', 320, 180),
+                                    ('high', 480, 360), ('standard', 640, 480),
+                                    ('maxres', 1280, 720)]
+    )
+
+    return {
+        'kind': 'youtube#video',
+        'etag': ''.join(generator.choice('abcdefABCDEF0123456789') for _ in range(27)),
+        'id': video_id,
+        'snippet': {
+            'publishedAt': '2020-%02d-%02dT%02d:00:00Z' % (index % 12 + 1, index % 28 + 1,
+                                                          index % 24),
+            'channelId': 'UC' + video_id * 2,
+            'title': text(generator, 8),
+            'description': text(generator, 220),
+            'thumbnails': thumbnails,
+            'channelTitle': text(generator, 2),
+            'tags': [text(generator, 2) for _ in range(12)],
+            'categoryId': str(generator.randint(1, 30)),
+            'liveBroadcastContent': 'none',
+        },
+        'contentDetails': {
+            'duration': 'PT%dM%dS' % (generator.randint(1, 59), generator.randint(0, 59)),
+            'dimension': '2d',
+            'definition': 'hd',
+            'caption': 'false',
+            'licensedContent': True,
+            'projection': 'rectangular'
+        },
+        'statistics': {
+            'viewCount': str(generator.randint(0, 10 ** 7)),
+            'likeCount': str(generator.randint(0, 10 ** 5)),
+            'dislikeCount': str(generator.randint(0, 10 ** 4)),
+            'favoriteCount': '0',
+            'commentCount': str(generator.randint(0, 10 ** 4))
+        }
+    }
+
+
+def encode_pickle_json(item):
+    return pickle.dumps(json.dumps(item))
+
+
+def decode_pickle_json(payload):
+    return json.loads(pickle.loads(payload))
+
+
+def encode_json(item):
+    return json.dumps(item, separators=(',', ':')).encode('utf-8')
+
+
+def decode_json(payload):
+    return json.loads(payload.decode('utf-8'))
+
+
+CODECS = [
+    ('pickle(json)', encode_pickle_json, decode_pickle_json),
+    ('json', encode_json, decode_json),
+    ('lib.codec', codec.encode, codec.decode),
+]
+
+
+def timed(func, items):
+    best = None
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        payload = [func(item) for item in items]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    return payload, best * 1000
+
+
+def file_size(path, name, payloads):
+    """
+    Size of a database holding `PAGES` pages of the payloads, divided by the page count
+    """
+    filename = os.path.join(path, '%s.sqlite' % name.replace('(', '_').replace(')', ''))
+
+    with closing(sqlite3.connect(filename)) as connection:
+        connection.execute('CREATE TABLE storage (key TEXT PRIMARY KEY, time INTEGER, '
+                           'value BLOB)')
+        connection.executemany(
+            'INSERT INTO storage (key,time,value) VALUES(?,?,?)',
+            [('%d-%d' % (page, index), 0, sqlite3.Binary(payload))
+             for page in range(PAGES) for index, payload in enumerate(payloads)]
+        )
+        connection.commit()
+
+    return os.path.getsize(filename) / 1024.0 / PAGES
+
+
+def main():
+    generator = random.Random(2020)
+    items = [video(generator, index) for index in range(ITEM_COUNT)]
+
+    size = sum(len(encode_json(item)) for item in items) / float(ITEM_COUNT) / 1024
+    print('%d videos per page, %.1f KiB each as json, best of %d runs' %
+          (ITEM_COUNT, size, RUNS))
+    print('%-12s | %11s | %11s | %13s' % ('codec', 'encode [ms]', 'decode [ms]',
+                                          'file [KiB/pg]'))
+
+    with tempfile.TemporaryDirectory() as path:
+        for name, encode, decode in CODECS:
+            payloads, encode_ms = timed(encode, items)
+            _, decode_ms = timed(decode, payloads)
+
+            print('%-12s | %11.1f | %11.1f | %13.0f' %
+                  (name, encode_ms, decode_ms, file_size(path, name, payloads)))
+
+
+if __name__ == '__main__':
+    main()
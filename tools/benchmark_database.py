@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (C) 2020 Tubed (plugin.video.tubed)
+
+    This file is part of plugin.video.tubed
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only.txt for more information.
+
+    Count the sqlite connections opened, and the time taken, while a listing of 50 videos
+    reads the data cache, the search history and the favorite channels. The baseline
+    columns are the same listing with a connection opened for every outermost call, the
+    way it was before connections were shared
+
+    Requires Kodistubs (pip install Kodistubs), from the root of the repository:
+
+        python tools/benchmark_database.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'resources', 'lib'))
+
+# pylint: disable=wrong-import-position,import-error
+from src.lib.cache import Cache
+from src.lib.database import CONNECTIONS
+from src.lib.database import Database
+from src.lib.sql_storage import Storage
+
+ITEM_COUNT = 50
+RUNS = 5
+
+CONNECTS = [0]
+OPEN_PER_CALL = [False]
+
+
+def counted_connect(connect):
+    def wrapper(*args, **kwargs):
+        CONNECTS[0] += 1
+        return connect(*args, **kwargs)
+
+    return wrapper
+
+
+def closed_per_call(close):
+    """
+    Close the shared connection when its outermost use ends while OPEN_PER_CALL is set, so
+    the next call opens it again
+    """
+
+    def wrapper(database):
+        connection = database._file  # pylint: disable=protected-access
+        close(database)
+
+        if OPEN_PER_CALL[0] and connection is not None and connection.depth == 0:
+            CONNECTIONS.close(database.filename)
+
+    return wrapper
+
+
+def listing(data_cache, search_history, favorite_channels, content_ids):
+    cached = data_cache.get_items(3600, content_ids)
+
+    missing = [content_id for content_id in content_ids if content_id not in cached]
+    if missing:
+        data_cache.set_all(dict((content_id, {'id': content_id, 'kind': 'youtube#video'})
+                                for content_id in missing))
+
+    _ = search_history.list()
+    _ = favorite_channels.list()
+
+    # items resolved one at a time, ie. by their context menus
+    for content_id in content_ids:
+        _ = data_cache.get_item(3600, content_id)
+
+
+def run_listings(path, content_ids):
+    """
+    :return: connects and milliseconds of each run
+    :rtype: list
+    """
+    os.makedirs(path)
+
+    data_cache = Cache(os.path.join(path, 'data_cache.sqlite'))
+    search_history = Storage(os.path.join(path, 'search_history.sqlite'))
+    favorite_channels = Storage(os.path.join(path, 'favorite_channels.sqlite'),
+                                max_item_count=2500)
+
+    results = []
+    for _ in range(RUNS):
+        CONNECTS[0] = 0
+
+        started = time.perf_counter()
+        listing(data_cache, search_history, favorite_channels, content_ids)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        results.append((CONNECTS[0], elapsed))
+
+    return results
+
+
+def main():
+    sqlite3.connect = counted_connect(sqlite3.connect)
+    # pylint: disable=protected-access
+    Database._close = closed_per_call(Database._close)
+
+    content_ids = ['video%02d' % index for index in range(ITEM_COUNT)]
+
+    with tempfile.TemporaryDirectory() as path:
+        shared = run_listings(os.path.join(path, 'shared'), content_ids)
+
+        OPEN_PER_CALL[0] = True
+        try:
+            baseline = run_listings(os.path.join(path, 'baseline'), content_ids)
+        finally:
+            OPEN_PER_CALL[0] = False
+
+    print('%d item listing, %d runs' % (ITEM_COUNT, RUNS))
+    print('%-8s | %8s | %8s | %17s | %11s' % ('run', 'connects', 'ms', 'baseline connects',
+                                              'baseline ms'))
+
+    for run, ((connects, elapsed), (baseline_connects, baseline_elapsed)) in \
+            enumerate(zip(shared, baseline)):
+        print('%-8s | %8d | %8.1f | %17d | %11.1f' %
+              ('first' if run == 0 else 'repeat', connects, elapsed, baseline_connects,
+               baseline_elapsed))
+
+
+if __name__ == '__main__':
+    main()